@@ -0,0 +1,92 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from catconv.model import Model
+from catconv.parameters import Parameters
+
+# Grid convergence benchmark of the transient model.
+#
+# Solves the light-off programme on a set of (nz, ns) grids and on a fine
+# reference grid. A grid NZxNS/RATIO grades the washcoat towards the gas
+# interface, its last radial spacing RATIO times the first (see
+# Parameters.s_ratio). For every grid it records the wall time, the solver work
+# (steps, right-hand side and Jacobian evaluations) and the largest deviation
+# of the outlet CO and HC conversions from the reference over the run, and
+# names the cheapest grid within the accuracy target. Run from the top of the
+# repository:
+#
+#   python -m benchmarks.grid_convergence --tf 1800 --ref 40x40 \
+#       --grids 5x5,10x5,10x5/8,10x10 --target 0.01 --out grids.json
+
+GRIDS = '5x3,5x5,10x5,5x10,10x10,20x10,20x20'
+
+
+def grid(text):
+    text, sep, ratio = text.partition('/')
+    nz, ns = text.lower().split('x')
+    return int(nz), int(ns), float(ratio) if sep else 1.0
+
+
+def name(r):
+    return '%dx%d' % (r['nz'], r['ns'])+('/%g' % r['s_ratio'] if r['s_ratio'] != 1 else '')
+
+
+def run(nz, ns, ratio, tout):
+    p = Parameters(s_ratio=ratio)
+    m = Model(p, nz, ns)
+    t0 = time.time()
+    Y = m.solve(tout)
+    wall = time.time()-t0
+    Ya, Yb, Yc, Tk = m.lay.gas(Y).transpose(1,0,2)
+    result = dict(nz=nz, ns=ns, s_ratio=ratio, n=m.lay.n, wall=wall)
+    result.update(m.stats)
+    return result, (p.Yae-Ya[:,-1])/p.Yae, (p.Yce-Yc[:,-1])/p.Yce
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Grid convergence of the transient monolith model')
+    ap.add_argument('--tf', type=float, default=1800, help='end of the run, s')
+    ap.add_argument('--td', type=float, default=1, help='output interval, s')
+    ap.add_argument('--ref', type=grid, default='40x40', help='reference grid, NZxNS')
+    ap.add_argument('--grids', default=GRIDS, help='comma separated grids, NZxNS or NZxNS/RATIO')
+    ap.add_argument('--target', type=float, default=0.01, help='accepted conversion error')
+    ap.add_argument('--out', help='write the results to this JSON file')
+    args = ap.parse_args(argv)
+
+    tout = np.arange(0, args.tf+args.td, args.td)
+    ref, COref, HCref = run(args.ref[0], args.ref[1], args.ref[2], tout)
+
+    rows = []
+    for nz, ns, ratio in [grid(g) for g in args.grids.split(',')]:
+        r, CO, HC = run(nz, ns, ratio, tout)
+        r['CO_error'] = float(np.max(np.abs(CO-COref)))
+        r['HC_error'] = float(np.max(np.abs(HC-HCref)))
+        rows.append(r)
+
+    print('%9s %6s %9s %7s %6s %5s %10s %10s' % ('grid', 'n', 'wall [s]', 'steps', 'rhs', 'jac', 'CO error', 'HC error'))
+    for r in rows+[ref]:
+        if r is ref:
+            err = ('reference', '')
+        else:
+            err = ('%.2e' % r['CO_error'], '%.2e' % r['HC_error'])
+        print('%9s %6d %9.2f %7d %6d %5d %10s %10s' % (name(r), r['n'], r['wall'],
+                                                      r['steps'], r['rhs'], r['jac'], err[0], err[1]))
+
+    ok = [r for r in rows if max(r['CO_error'], r['HC_error']) <= args.target]
+    best = min(ok, key=lambda r: r['wall']) if ok else None
+    if best:
+        print('cheapest grid within %g: %s' % (args.target, name(best)))
+    else:
+        print('no grid within %g' % args.target)
+
+    if args.out:
+        with open(args.out, 'w') as fh:
+            json.dump(dict(tf=args.tf, td=args.td, target=args.target, reference=ref, grids=rows,
+                           cheapest=best and name(best)), fh, indent=1)
+
+
+if __name__ == '__main__':
+    main()
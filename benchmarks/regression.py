@@ -0,0 +1,206 @@
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from catconv import metrics
+from catconv.model import Model
+from catconv.parameters import Parameters
+from catconv.schedule import Schedule
+
+# Performance regression benchmark of the transient solver.
+#
+# Runs a fixed set of cases and records for each the wall time of the
+# solve, the peak memory of the process, the solver work (steps, right-hand
+# side and Jacobian evaluations, LU factorisations, Newton iterations) and
+# the largest deviation of the outlet CO and HC conversions from stored
+# reference trajectories:
+#
+#   lightoff   the 1800 s light-off programme rt1 .. rt6, 5x5 grid
+#   steady     constant entering gas at 530 K for 600 s, 5x5 grid
+#   fine       the light-off programme on a 20x20 grid
+#   drive      3600 s of a synthetic 1 Hz drive cycle of temperature, flow
+#              and CO/C3H8, 5x5 grid
+#
+# Every case runs in a fresh process, so the cases do not share caches or
+# memory and the peak resident size is that of the case (the interpreter
+# and the libraries included). The references are the same cases solved at
+# a tight tolerance, kept in reference.npz next to this file and rewritten
+# with --update-reference when a change of the answers is intended.
+#
+# The results go to a JSON file with the commit and library versions, and
+# a later run compared against it fails (exit status 1) when a case is
+# slower by more than --slowdown, in wall time or in solver work (right-hand
+# side and Jacobian evaluations), or drifts from its reference by more than
+# --drift. The work is the same from run to run, the wall time of the
+# sub-second cases varies by some 20 % on a busy machine; --repeat takes the
+# fastest of several runs. The whole suite takes about 30 s on one core,
+# nearly all of it the drive cycle. Run from the top of the repository:
+#
+#   python -m benchmarks.regression --out base.json
+#   ... change the model ...
+#   python -m benchmarks.regression --compare base.json --slowdown 1.2
+
+CASES = dict(
+    lightoff=dict(nz=5, ns=5, tf=1800.0, schedule=None),
+    steady=dict(nz=5, ns=5, tf=600.0, schedule='steady'),
+    fine=dict(nz=20, ns=20, tf=1800.0, schedule=None),
+    drive=dict(nz=5, ns=5, tf=3600.0, schedule='drive'),
+)
+ORDER = ('lightoff', 'steady', 'fine', 'drive')
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference.npz')
+COUNTERS = ('steps', 'rhs', 'jac', 'lu', 'newton')
+
+
+def drive_cycle(p, tf):
+    # Synthetic drive cycle at 1 Hz: a load of one-minute accelerations,
+    # stronger and weaker over 15 minutes, on a warming exhaust
+    t = np.arange(0.0, tf+1.0, 1.0)
+    load = np.sin(np.pi*t/60)**2*(0.6+0.4*np.sin(2*np.pi*t/900))
+    return Schedule(t, Tke=420+120*(1-np.exp(-t/900))+30*load, Mflow=p.Mflow*(0.4+0.8*load),
+                    Yae=p.Yae*(0.5+1.5*load), Yce=p.Yce*(0.5+1.5*load))
+
+
+def schedule(name, p, tf):
+    if name is None:
+        return None
+    if name == 'steady':
+        return Schedule([0.0], Tke=[530.0])
+    if name == 'drive':
+        return drive_cycle(p, tf)
+    raise ValueError('unknown schedule %r' % name)
+
+
+def run(name, rtol):
+    # One case; returns its result and its outlet conversions
+    import resource
+    case = CASES[name]
+    p = Parameters()
+    m = Model(p, case['nz'], case['ns'], schedule=schedule(case['schedule'], p, case['tf']))
+    tout = np.arange(0.0, case['tf']+0.5, 1.0)
+    t0 = time.perf_counter()
+    Y = m.solve(tout, rtol=rtol)
+    wall = time.perf_counter()-t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak /= 2.0**20 if sys.platform == 'darwin' else 2.0**10            # bytes on macOS, kB elsewhere
+    Ya, Yb, Yc, Tk = metrics.outlet(m.lay, Y)
+    out = metrics.metrics(tout, Ya, Yc, metrics.entering(tout, p, m.programme()), p)
+    result = dict(case=name, n=m.lay.n, rtol=rtol, wall=wall, peak_mb=peak)
+    result.update((k, m.stats[k]) for k in COUNTERS)
+    return result, tout, out['COconv'], out['HCconv']
+
+
+def isolated(name, rtol):
+    # run() in a fresh process
+    pool = multiprocessing.get_context('spawn').Pool(1)
+    try:
+        return pool.apply(run, (name, rtol))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def commit():
+    # Commit of the working tree, None outside a git checkout
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                      cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode().strip()
+
+
+def update_reference(names, rtol, path):
+    # Solve the cases at rtol and keep their conversions as the references,
+    # other cases of an existing file are kept
+    ref = dict(np.load(path)) if os.path.exists(path) else {}
+    for name in names:
+        r, t, CO, HC = isolated(name, rtol)
+        ref[name+'.t'] = t
+        ref[name+'.COconv'] = CO
+        ref[name+'.HCconv'] = HC
+        ref[name+'.rtol'] = np.array(rtol)
+        print('%s: reference at rtol %g in %.1f s' % (name, rtol, r['wall']))
+    np.savez_compressed(path, **ref)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Performance regression benchmark of the transient solver')
+    ap.add_argument('--cases', default=','.join(ORDER), help='comma separated cases, of %s' % ', '.join(ORDER))
+    ap.add_argument('--rtol', type=float, default=1E-5, help='solver tolerance of the timed runs')
+    ap.add_argument('--repeat', type=int, default=1, help='runs per case, the fastest counts')
+    ap.add_argument('--reference', default=REFERENCE, help='reference trajectories, .npz')
+    ap.add_argument('--update-reference', action='store_true',
+                    help='solve the cases at --reference-rtol into --reference and stop')
+    ap.add_argument('--reference-rtol', type=float, default=1E-8, help='solver tolerance of the references')
+    ap.add_argument('--out', help='write the results to this JSON file')
+    ap.add_argument('--compare', metavar='JSON', help='results of an earlier run to compare with')
+    ap.add_argument('--slowdown', type=float, default=1.25,
+                    help='accepted ratio of wall times to those of --compare')
+    ap.add_argument('--drift', type=float, default=1E-3, help='accepted conversion deviation from the references')
+    args = ap.parse_args(argv)
+
+    names = args.cases.split(',')
+    for name in names:
+        if name not in CASES:
+            ap.error('unknown case %r' % name)
+    if args.update_reference:
+        update_reference(names, args.reference_rtol, args.reference)
+        return 0
+    ref = dict(np.load(args.reference)) if os.path.exists(args.reference) else {}
+    base = {}
+    if args.compare:
+        with open(args.compare) as fh:
+            base = json.load(fh)['cases']
+
+    rows = []
+    failures = []
+    for name in names:
+        runs = [isolated(name, args.rtol) for k in range(max(1, args.repeat))]
+        r, t, CO, HC = min(runs, key=lambda run: run[0]['wall'])
+        r['CO_drift'] = r['HC_drift'] = None
+        if name+'.COconv' in ref and np.array_equal(ref[name+'.t'], t):
+            r['CO_drift'] = float(np.max(np.abs(CO-ref[name+'.COconv'])))
+            r['HC_drift'] = float(np.max(np.abs(HC-ref[name+'.HCconv'])))
+            if max(r['CO_drift'], r['HC_drift']) > args.drift:
+                failures.append('%s: conversions drift %.2e from the reference'
+                                % (name, max(r['CO_drift'], r['HC_drift'])))
+        else:
+            failures.append('%s: no reference trajectory, see --update-reference' % name)
+        if name in base:
+            r['slowdown'] = r['wall']/base[name]['wall']
+            r['work'] = float(r['rhs']+r['jac'])/(base[name]['rhs']+base[name]['jac'])
+            if r['slowdown'] > args.slowdown:
+                failures.append('%s: %.2fx the wall time of %s' % (name, r['slowdown'], args.compare))
+            if r['work'] > args.slowdown:
+                failures.append('%s: %.2fx the solver work of %s' % (name, r['work'], args.compare))
+        rows.append(r)
+
+    print('%9s %6s %9s %8s %7s %7s %5s %5s %10s %10s %9s %9s' % ('case', 'n', 'wall [s]', 'peak [MB]', 'steps',
+                                                              'rhs', 'jac', 'lu', 'CO drift', 'HC drift',
+                                                              'wall/base', 'work/base'))
+    for r in rows:
+        drift = ['-' if r[k] is None else '%.2e' % r[k] for k in ('CO_drift', 'HC_drift')]
+        ratios = ['%.2fx' % r[k] if k in r else '-' for k in ('slowdown', 'work')]
+        print('%9s %6d %9.2f %8.1f %7d %7d %5d %5d %10s %10s %9s %9s'
+              % (r['case'], r['n'], r['wall'], r['peak_mb'], r['steps'], r['rhs'], r['jac'], r['lu'],
+                 drift[0], drift[1], ratios[0], ratios[1]))
+    for f in failures:
+        print('FAIL ' + f)
+
+    if args.out:
+        import scipy
+        with open(args.out, 'w') as fh:
+            json.dump(dict(commit=commit(), date=time.strftime('%Y-%m-%dT%H:%M:%S'), python=sys.version.split()[0],
+                           numpy=np.__version__, scipy=scipy.__version__, rtol=args.rtol,
+                           cases=dict((r['case'], r) for r in rows), failures=failures), fh, indent=1)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+# Transient model of a catalytic converter monolith slice
+#
+# The package itself imports nothing: the names below are loaded from their
+# modules on first use, so `import catconv` is free and a worker only pays
+# for what it touches. The command line entry point is `python -m catconv`.
+
+_EXPORTS = dict(Model='catconv.model', Parameters='catconv.parameters',
+                Config='catconv.config', simulate='catconv.config',
+                Schedule='catconv.schedule', Store='catconv.store',
+                Realtime='catconv.realtime', Cache='catconv.cache')
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    import importlib
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
@@ -0,0 +1,104 @@
+import argparse
+import json
+import sys
+
+from catconv.config import Config, simulate
+
+# Command line entry point: run the configuration in a JSON file (the
+# defaults without one) and report the solver work and the light-off
+# metrics. Single items are overridden with --set, parameters as
+# parameters.NAME:
+#
+#   python -m catconv run.json --set tf=600 --set parameters.Tke=430 \
+#       --output results --plot conversion.png
+#
+# With --cache DIR a run made before with the same configuration is read back
+# instead of solved.
+#
+# matplotlib is only imported for --plot.
+
+
+def item(text):
+    # (name, value) of a NAME=VALUE override, the value read as JSON where
+    # it is valid JSON and as a string otherwise
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError('expected NAME=VALUE, not %r' % text)
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return name.strip(), value
+
+
+def plot(out, path):
+    # Outlet conversions against the entering temperature, saved to path
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    m = out['metrics']
+    fig, ax = plt.subplots()
+    ax.plot(m['Tke'], m['COconv'], label='CO')
+    ax.plot(m['Tke'], m['HCconv'], label='C3H8')
+    ax.set_xlabel('entering temperature [K]')
+    ax.set_ylabel('conversion')
+    ax.legend()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m catconv',
+                                 description='Transient simulation of a catalytic converter monolith')
+    ap.add_argument('config', nargs='?', help='JSON configuration file, see catconv.config')
+    ap.add_argument('--set', type=item, action='append', default=[], metavar='NAME=VALUE',
+                    help='override a configuration item, parameters.NAME for a parameter')
+    ap.add_argument('--output', help='result store directory')
+    ap.add_argument('--cache', metavar='DIR', help='result cache directory, see catconv.cache')
+    ap.add_argument('--plot', metavar='PNG', help='plot the conversions against the entering temperature')
+    ap.add_argument('--save-config', metavar='JSON', help='write the complete configuration and stop')
+    args = ap.parse_args(argv)
+
+    items = Config.from_file(args.config).items() if args.config else {}
+    items = dict(items)
+    items['parameters'] = dict(items.get('parameters', {}))
+    for name, value in args.set:
+        if name.startswith('parameters.'):
+            items['parameters'][name[11:]] = value
+        else:
+            items[name] = value
+    if args.output:
+        items['output'] = args.output
+    if args.cache:
+        items['cache'] = args.cache
+    try:
+        config = Config(**items)
+    except TypeError as e:
+        ap.error(str(e))
+    if args.save_config:
+        config.save(args.save_config)
+        return 0
+
+    if args.plot:
+        try:
+            import matplotlib
+        except ImportError:
+            ap.error('--plot needs matplotlib')
+    from catconv.instrument import summary
+    out = simulate(config)
+    m = out['metrics']
+    if out['cached']:
+        print('results read from the cache')
+    print(summary(out['stats']))
+    for species in ('CO', 'HC'):
+        for k, level in enumerate(m['levels']):
+            print('%s T%d light-off %.1f K, extinction %.1f K'
+                  % (species, round(100*level), m['lightoff'][species][k], m['extinction'][species][k]))
+    print('emitted CO %.4g g, C3H8 %.4g g' % (m['mCO'][-1], m['mHC'][-1]))
+    if args.plot:
+        plot(out, args.plot)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import glob
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from catconv.parameters import Parameters
+
+# Content-addressed cache of simulation results.
+#
+# Sweeps, fits and reports re-run the same configurations many times. A
+# Cache keeps the outlet histories, metrics and solver report of every run
+# in a directory, one .npz file per run named by its key:
+#
+#   key = sha256 of the canonical JSON of
+#         - the configuration items that determine the result: parameter
+#           overrides, grids, output times, tolerance, metric levels and
+#           the schedule, a CSV schedule by the contents of its file
+#         - the code version: the sources of every catconv module and the
+#           numpy and scipy versions
+#
+# Numbers are canonicalised to floats, so 430 and 430.0 give the same key,
+# and parameters are keyed by the values of all of them, overridden or not,
+# while where results go (store, checkpoint, trace, cache) does not count.
+# An entry written by other code is never found again; on opening, a cache
+# made by another code version is emptied.
+#
+# The size of the directory is kept below limit bytes by deleting the least
+# recently used entries; a hit touches its file, so recency is the file's
+# modification time. Entries are written to a temporary file and renamed,
+# so concurrent runs and crashes never leave a partial entry.
+#
+#   out = simulate(Config(tf=600, cache='cache'))     # solved and stored
+#   out = simulate(Config(tf=600, cache='cache'))     # read back, out['cached']
+
+# Configuration items that do not change the result
+WHERE = ('output', 'meta', 'checkpoint', 'checkpoint_interval', 'trace', 'cache', 'cache_limit')
+
+_version = None
+
+
+def code_version():
+    # Hash of the catconv sources and the numerical libraries, once per
+    # process
+    global _version
+    if _version is None:
+        import scipy
+        h = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+            h.update(os.path.basename(path).encode())
+            with open(path, 'rb') as fh:
+                h.update(fh.read())
+        h.update(('numpy %s scipy %s' % (np.__version__, scipy.__version__)).encode())
+        _version = h.hexdigest()
+    return _version
+
+
+def canonical(value):
+    # JSON-serialisable form of value with sorted keys and float numbers
+    if isinstance(value, dict):
+        return dict((str(k), canonical(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    raise TypeError('cannot key a %s' % type(value).__name__)
+
+
+def _file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        h.update(fh.read())
+    return h.hexdigest()
+
+
+def key(config):
+    # Cache key of a config.Config; parameters go in by their effective
+    # values, so an override equal to its default does not count
+    items = dict((name, value) for name, value in config.items().items() if name not in WHERE)
+    items['parameters'] = Parameters(**items['parameters']).values()
+    schedule = items['schedule']
+    if schedule is not None:
+        schedule = dict(path=schedule) if isinstance(schedule, str) else dict(schedule)
+        schedule['path'] = _file(schedule['path'])
+        items['schedule'] = schedule
+    text = json.dumps(dict(items=canonical(items), code=code_version()), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Cache(object):
+
+    def __init__(self, path, limit=1E9):
+        # path  - cache directory, created when missing
+        # limit - largest total size of the entries, bytes
+        self.path = path
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        stamp = os.path.join(path, 'VERSION')
+        version = code_version()
+        found = None
+        if os.path.exists(stamp):
+            with open(stamp) as fh:
+                found = fh.read()
+        if found != version:
+            self.clear()
+            with open(stamp, 'w') as fh:
+                fh.write(version)
+
+    def _entry(self, key):
+        return os.path.join(self.path, key+'.npz')
+
+    def entries(self):
+        return glob.glob(os.path.join(self.path, '*.npz'))
+
+    def get(self, key):
+        # The result stored under key as put() was given it, or None
+        path = self._entry(key)
+        try:
+            with np.load(path) as data:
+                result = _unflatten(dict((name, data[name]) for name in data.files))
+        except (IOError, OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # missing, or truncated or corrupt: the entry is written again
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        # Store result, a dict of arrays, numbers, strings and nested dicts
+        # of them (a dict of JSON values under 'stats'), and evict
+        tmp = self._entry(key)+'.%d.tmp' % os.getpid()
+        with open(tmp, 'wb') as fh:
+            np.savez(fh, **_flatten(result))
+        os.replace(tmp, self._entry(key))
+        self.evict()
+
+    def evict(self):
+        # Delete the least recently used entries until the rest fit limit
+        entries = []
+        for path in self.entries():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for path in self.entries():
+            os.remove(path)
+
+    def size(self):
+        return sum(os.path.getsize(path) for path in self.entries())
+
+
+def _flatten(result, prefix=''):
+    # Nested dict to flat '.'-joined names; stats go as one JSON string
+    flat = {}
+    for name, value in result.items():
+        if name == 'stats' and not prefix:
+            flat['stats'] = np.array(json.dumps(value, default=float))
+        elif isinstance(value, dict):
+            flat.update(_flatten(value, prefix+name+'.'))
+        else:
+            flat[prefix+name] = np.asarray(value)
+    return flat
+
+
+def _unflatten(flat):
+    result = {}
+    for name, value in flat.items():
+        if name == 'stats':
+            result['stats'] = json.loads(str(value))
+            continue
+        d = result
+        parts = name.split('.')
+        for part in parts[:-1]:
+            d = d.setdefault(part, {})
+        d[parts[-1]] = value
+    return result
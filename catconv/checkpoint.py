@@ -0,0 +1,98 @@
+import os
+import time
+
+import numpy as np
+
+# Checkpoints of long transient runs.
+#
+# A checkpoint is one .npz file holding everything Model.steps() needs to
+# carry on from an output time as if it had never stopped:
+#
+#   k, t             last output step completed and the solver time
+#   y                solver state vector (node-major)
+#   rwork, iwork     VODE work arrays: Nordsieck history, step size, order,
+#                    error weights, the factorised Newton matrix, counters
+#   state_doubles,   VODE internal variables kept between calls
+#   state_ints
+#   istate           VODE task state
+#   segment          schedule segment of t, for information
+#   tout, rtol, atol, y0, model, schedule
+#                    the run the checkpoint belongs to, checked on resume
+#   results_*        results not yet elsewhere on disk, from the caller:
+#                    the outputs so far of Model.solve(), the unwritten tail
+#                    of a store.Writer
+#
+# Because the complete integrator state is restored, a resumed run takes
+# exactly the steps of the uninterrupted one and its results are bit
+# identical. Checkpoints are only taken between output steps, at most every
+# interval seconds of wall-clock time; each is written to a temporary file
+# and renamed over the previous one, so a crash while writing leaves the last
+# complete checkpoint in place. At the default interval the cost is one small
+# file write a minute.
+#
+#   ck = Checkpoint('run.ckpt', interval=60)
+#   m.run(tout, 'results', checkpoint=ck)     # killed half way
+#   m.run(tout, 'results', checkpoint=ck)     # carries on from the last one
+
+
+class Checkpoint(object):
+
+    def __init__(self, path, interval=60.0, resume=True):
+        # path     - checkpoint file
+        # interval - minimum wall-clock time between checkpoints, s; 0
+        #            checkpoints at every output step
+        # resume   - continue from an existing checkpoint at path; False
+        #            starts afresh and overwrites it
+        self.path = path
+        self.interval = interval
+        self.resume = resume
+        self.saves = 0
+        self._saved = None
+        self._last = time.time()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        # Contents of the checkpoint to resume from as a dict, or None
+        if not self.resume or not self.exists():
+            return None
+        if self._saved is None:
+            with np.load(self.path) as data:
+                self._saved = dict((name, data[name]) for name in data.files)
+            self._last = time.time()
+        return self._saved
+
+    def results(self, *names):
+        # Caller results saved with the checkpoint, without the prefix; names
+        # are the results the caller expects
+        saved = self.load()
+        if saved is None:
+            return None
+        results = dict((name[8:], value) for name, value in saved.items() if name.startswith('results_'))
+        if set(names)-set(results):
+            raise ValueError('checkpoint %s is of another kind of run' % self.path)
+        return results
+
+    def due(self):
+        return time.time()-self._last >= self.interval
+
+    def save(self, state, results=None):
+        # Write the solver state and the caller's results (dicts of arrays)
+        data = dict(state)
+        for name, value in (results or {}).items():
+            data['results_'+name] = value
+        tmp = self.path+'.tmp'
+        with open(tmp, 'wb') as fh:
+            np.savez(fh, **data)
+        os.replace(tmp, self.path)
+        self._saved = None
+        self.resume = True
+        self.saves += 1
+        self._last = time.time()
+
+    def check(self, saved, **run):
+        # Raise if the checkpoint belongs to another run than run
+        for name, value in run.items():
+            if name not in saved or not np.array_equal(saved[name], value):
+                raise ValueError('checkpoint %s is of another run: %s differs' % (self.path, name))
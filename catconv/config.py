@@ -0,0 +1,151 @@
+import json
+
+import numpy as np
+
+from catconv import metrics
+from catconv.cache import Cache, key
+from catconv.checkpoint import Checkpoint
+from catconv.model import Model
+from catconv.parameters import Parameters
+from catconv.schedule import Schedule
+
+# Run configuration and the one-call entry point of the library.
+#
+# A Config describes one transient run: the Parameters overrides, the grid,
+# the output times, the solver tolerance, the entering conditions and where
+# the results go. Like Parameters, its class attributes are the defaults
+# (the light-off experiment of FYP-transient.py) and any of them can be
+# overridden by keyword or from a JSON file:
+#
+#   {"parameters": {"Tke": 430, "vmean": 3.0},
+#    "nz": 10, "tf": 1800, "td": 1,
+#    "schedule": {"path": "cycle.csv", "scale": {"Yae": 1e-6}},
+#    "output": "results"}
+#
+# simulate(config) builds the model, runs it and returns the outlet metrics
+# with the solver report; with a cache directory, a run made before is read
+# back from it instead, see cache.Cache. Nothing runs on import, nothing is
+# printed and plotting is left to the caller, so the library embeds in other
+# programs and worker processes start with numpy and the model modules only;
+# scipy's integrators are imported by the first solve.
+#
+#   out = simulate(Config(tf=600, parameters=dict(Tke=430)))
+#   out['metrics']['COconv'][-1]
+
+# Configuration items, in file order
+ITEMS = ('parameters', 'nz', 'ns', 'nu', 't0', 'tf', 'td', 'rtol', 'schedule', 'output', 'meta',
+         'checkpoint', 'checkpoint_interval', 'trace', 'levels', 'cache', 'cache_limit')
+
+
+class Config(object):
+
+    parameters = {}             # Parameters overrides
+    nz = 5                      # axial grid
+    ns = 5                      # radial washcoat grid
+    nu = 3                      # radial cordierite grid, 0 leaves it out
+    t0 = 0.0                    # output times t0, t0+td, .. tf, s
+    tf = 1800.0
+    td = 1.0
+    rtol = 1E-5
+    schedule = None             # entering conditions: None for the light-off
+                                # programme, or a CSV path or dict(path=...,
+                                # rename=..., scale=...), see schedule.Schedule
+    output = None               # result store directory; None keeps the states
+                                # in memory
+    meta = {}                   # run description kept in the store
+    checkpoint = None           # checkpoint file of the run
+    checkpoint_interval = 60.0  # s of wall-clock time between checkpoints
+    trace = None                # CSV file of every solver step
+    levels = metrics.LEVELS     # conversion levels of the light-off metrics
+    cache = None                # result cache directory, runs without an
+                                # output store only
+    cache_limit = 1E9           # largest size of the cache, bytes
+
+    def __init__(self, **kw):
+        for name, value in kw.items():
+            if name not in ITEMS:
+                raise TypeError('unknown configuration item %r' % name)
+            setattr(self, name, value)
+        self.parameters = dict(self.parameters)
+        self.meta = dict(self.meta)
+        Parameters(**self.parameters)           # fails early on unknown parameters
+
+    @classmethod
+    def from_file(cls, path):
+        # Config from a JSON file
+        with open(path) as fh:
+            items = json.load(fh)
+        if not isinstance(items, dict):
+            raise ValueError('%s does not hold a configuration object' % path)
+        return cls(**items)
+
+    def items(self):
+        # All items, defaults included, as a JSON-serialisable dict
+        items = dict((name, getattr(self, name)) for name in ITEMS)
+        items['levels'] = list(items['levels'])
+        return items
+
+    def save(self, path):
+        with open(path, 'w') as fh:
+            json.dump(self.items(), fh, indent=1)
+
+    def tout(self):
+        return np.arange(self.t0, self.tf+0.5*self.td, self.td)
+
+    def programme(self):
+        # The schedule of the entering conditions, None for the light-off
+        # programme
+        if self.schedule is None:
+            return None
+        options = dict(path=self.schedule) if isinstance(self.schedule, str) else dict(self.schedule)
+        return Schedule.from_csv(options.pop('path'), **options)
+
+    def model(self):
+        return Model(Parameters(**self.parameters), self.nz, self.ns, self.nu, schedule=self.programme())
+
+
+def simulate(config=None, **kw):
+    # Run config (a Config, a path of a JSON file or None for the
+    # defaults, with items overridden by kw). Returns a dict of
+    #   config    the Config run
+    #   model     the Model
+    #   t         output times
+    #   states    output states (len(t), n), None when written to a store
+    #   outlet    dict of the outlet histories Ya, Yb, Yc, Tk, None when
+    #             written to a store
+    #   metrics   outlet metrics, see metrics.metrics()
+    #   stats     solver report, see instrument
+    #   cached    whether the results came from the cache; model and
+    #             states are then None
+    if config is None:
+        config = Config(**kw)
+    elif isinstance(config, str):
+        config = Config(**dict(Config.from_file(config).items(), **kw))
+    elif kw:
+        config = Config(**dict(config.items(), **kw))
+    cache = None
+    if config.cache is not None and config.output is None:
+        cache = Cache(config.cache, config.cache_limit)
+        k = key(config)
+        hit = cache.get(k)
+        if hit is not None:
+            return dict(config=config, model=None, t=hit['t'], states=None, outlet=hit['outlet'],
+                        metrics=hit['metrics'], stats=hit['stats'], cached=True)
+    m = config.model()
+    tout = config.tout()
+    ck = Checkpoint(config.checkpoint, config.checkpoint_interval) if config.checkpoint else None
+    schedule = m.programme()
+    if config.output is not None:
+        meta = dict(config.meta, config=config.items())
+        m.run(tout, config.output, rtol=config.rtol, meta=meta, checkpoint=ck, trace=config.trace)
+        Y = outlet = None
+        out = metrics.store(config.output, m.p, schedule, config.levels)
+    else:
+        Y = m.solve(tout, rtol=config.rtol, checkpoint=ck, trace=config.trace)
+        outlet = dict(zip(('Ya', 'Yb', 'Yc', 'Tk'), metrics.outlet(m.lay, Y)))
+        out = metrics.metrics(tout, outlet['Ya'], outlet['Yc'], metrics.entering(tout, m.p, schedule), m.p,
+                              config.levels)
+    if cache is not None:
+        cache.put(k, dict(t=tout, outlet=outlet, metrics=out, stats=m.stats))
+    return dict(config=config, model=m, t=tout, states=Y, outlet=outlet, metrics=out, stats=m.stats,
+                cached=False)
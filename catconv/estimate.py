@@ -0,0 +1,186 @@
+import multiprocessing
+
+import numpy as np
+import scipy.optimize
+
+from catconv import metrics
+from catconv.parameters import Parameters
+from catconv.schedule import Schedule
+from catconv.sensitivity import Sensitivity
+
+# Kinetic parameter estimation against measured outlet conversions.
+#
+# An Experiment is one bench run: its operating conditions (Parameters
+# overrides as in a sweep scenario), optionally a schedule of the entering
+# gas, and the measured outlet CO and/or HC conversion at a set of times.
+# Calibration fits kinetic constants (sensitivity.PRE, sensitivity.ACT) to
+# any number of experiments by nonlinear least squares. The unknowns are the
+# relative changes x_k of the constants, value = value0*exp(x), so
+# pre-exponential factors and activation temperatures are fitted on the same
+# footing. Every evaluation solves each experiment once with its forward
+# sensitivities, which gives the residuals and their Jacobian together, and
+# the experiments are spread over a process pool. Residuals are
+# (model - measured)/sigma.
+#
+#   cal = Calibration([Experiment.from_csv('run1.csv', dict(Yae=2E-3)),
+#                      Experiment.from_csv('run2.csv', dict(Yae=4E-3))],
+#                     ['pf', 'pt', 'act1', 'act3'])
+#   fit = cal.fit()
+#   fit['values']                       # fitted pf, pt, act1, act3
+
+MEASURED = ('COconv', 'HCconv')
+
+
+class Experiment(object):
+
+    def __init__(self, t, conditions=None, schedule=None, sigma=1.0, **measured):
+        # t          - measurement times, s, from the start of the run at 0
+        # conditions - Parameters overrides of the run
+        # schedule   - schedule.Schedule of the entering gas, the light-off
+        #              programme by default
+        # sigma      - measurement standard deviation of the conversions
+        # measured   - COconv and/or HCconv at the times t; NaN for missing
+        self.t = np.asarray(t, dtype=float)
+        self.conditions = dict(conditions or {})
+        self.schedule = schedule
+        self.sigma = sigma
+        unknown = set(measured)-set(MEASURED)
+        if unknown:
+            raise ValueError('unknown measured quantities %s' % ', '.join(sorted(unknown)))
+        if not measured:
+            raise ValueError('an experiment needs COconv or HCconv data')
+        self.measured = dict((name, np.asarray(measured[name], dtype=float)) for name in MEASURED
+                             if name in measured)
+        for name, data in self.measured.items():
+            if data.shape != self.t.shape:
+                raise ValueError('%s has %d values for %d times' % (name, data.size, self.t.size))
+
+    @classmethod
+    def from_csv(cls, path, conditions=None, schedule=None, sigma=1.0, time='t'):
+        # Experiment from a CSV file with a header row holding the time and
+        # COconv and/or HCconv columns. schedule may name a schedule CSV file.
+        data = np.genfromtxt(path, delimiter=',', names=True, ndmin=1)
+        if isinstance(schedule, str):
+            schedule = Schedule.from_csv(schedule)
+        measured = dict((name, data[name]) for name in MEASURED if name in data.dtype.names)
+        return cls(data[time], conditions, schedule, sigma, **measured)
+
+    def residuals(self, conv, dconv):
+        # Weighted residuals and their derivatives from the model conversions
+        # conv[name] (nt,) and derivatives dconv[name] (nt, nf)
+        r, J = [], []
+        for name, data in self.measured.items():
+            ok = np.isfinite(data)
+            r.append((conv[name][ok]-data[ok])/self.sigma)
+            J.append(dconv[name][ok]/self.sigma)
+        return np.concatenate(r), np.concatenate(J)
+
+
+def simulate(experiment, names, values, nz=5, ns=5, nu=3, rtol=1E-5):
+    # Outlet conversions of one experiment with the constants names set to
+    # values, and their derivatives with respect to x
+    p = Parameters(**dict(experiment.conditions, **dict(zip(names, values))))
+    m = Sensitivity(names, p, nz, ns, nu, schedule=experiment.schedule)
+    t = experiment.t
+    start = 0 if t[0] == 0 else 1
+    Z = m.solve(np.concatenate(([0.0], t)) if start else t, rtol=rtol)[start:]
+    gas = m.lay.gas(Z)                          # (nt, nf+1, 4, nz)
+    out = dict(Ya=gas[:,:,0,-1], Yc=gas[:,:,2,-1])
+    inlet = metrics.entering(t, p, m.programme())   # the schedule's Yae, Yce where it has them
+    Yae, Yce = inlet['Yae'], inlet['Yce']
+    conv = dict(COconv=(Yae-out['Ya'][:,0])/Yae, HCconv=(Yce-out['Yc'][:,0])/Yce)
+    dconv = dict(COconv=-out['Ya'][:,1:]/Yae[:,None], HCconv=-out['Yc'][:,1:]/Yce[:,None])
+    return conv, dconv
+
+
+def _evaluate(args):
+    experiment, names, values, nz, ns, nu, rtol = args
+    conv, dconv = simulate(experiment, names, values, nz, ns, nu, rtol)
+    return experiment.residuals(conv, dconv)
+
+
+class Calibration(object):
+
+    def __init__(self, experiments, names, p=None, nz=5, ns=5, nu=3, rtol=1E-5, processes=None):
+        # experiments - list of Experiment
+        # names       - constants to fit, from sensitivity.PRE and ACT
+        # p           - Parameters with the starting values of the constants
+        # processes   - worker processes, one per core by default, 1 runs
+        #               in-process
+        if p is None:
+            p = Parameters()
+        self.experiments = list(experiments)
+        self.names = tuple(names)
+        Sensitivity(self.names, p, 2, 2, 1)     # check the names
+        self.values0 = np.array([getattr(p, name) for name in self.names], dtype=float)
+        if np.any(self.values0 == 0):
+            raise ValueError('constants with value 0 cannot be fitted relatively')
+        self.grid = (nz, ns, nu)
+        self.rtol = rtol
+        self.evaluations = 0
+        self._last = None
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = min(processes, len(self.experiments))
+        self.pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+    def values(self, x):
+        # Constants at the relative changes x
+        return self.values0*np.exp(x)
+
+    def evaluate(self, x):
+        # Residuals and their Jacobian with respect to x, of all experiments
+        x = np.asarray(x, dtype=float)
+        if self._last is not None and np.array_equal(self._last[0], x):
+            return self._last[1], self._last[2]
+        values = self.values(x)
+        jobs = [(e, self.names, values)+self.grid+(self.rtol,) for e in self.experiments]
+        if self.pool is None:
+            parts = [_evaluate(job) for job in jobs]
+        else:
+            parts = self.pool.map(_evaluate, jobs, chunksize=1)
+        r = np.concatenate([r for r, J in parts])
+        J = np.concatenate([J for r, J in parts])
+        self.evaluations += 1
+        self._last = (x.copy(), r, J)
+        return r, J
+
+    def residuals(self, x):
+        return self.evaluate(x)[0]
+
+    def jacobian(self, x):
+        return self.evaluate(x)[1]
+
+    def fit(self, x0=None, **options):
+        # Least squares fit from x0 (the starting values by default); options
+        # go to scipy.optimize.least_squares. Returns the fitted values, x,
+        # the final cost and residuals, an approximate covariance of x and
+        # the optimizer result.
+        if x0 is None:
+            x0 = np.zeros(len(self.names))
+        # activation temperatures move the rates far more than the
+        # pre-exponential factors: scale the unknowns by the Jacobian
+        options.setdefault('x_scale', 'jac')
+        res = scipy.optimize.least_squares(self.residuals, x0, jac=self.jacobian, **options)
+        J = res.jac
+        dof = max(len(res.fun)-len(x0), 1)
+        try:
+            cov = np.linalg.inv(J.T.dot(J))*2*res.cost/dof
+        except np.linalg.LinAlgError:
+            cov = np.full((len(x0), len(x0)), np.nan)
+        return dict(names=self.names, values=dict(zip(self.names, self.values(res.x))),
+                    x=res.x, cost=res.cost, residuals=res.fun, covariance=cov,
+                    evaluations=self.evaluations, result=res)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
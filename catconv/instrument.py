@@ -0,0 +1,115 @@
+import time
+
+# Instrumentation of the solver and of the right-hand side hot path.
+#
+# Model.stats holds the report of the last solve, built from the VODE
+# counters and a Profile of the Python side:
+#
+#   steps, rejected     accepted steps; steps rejected by the error test
+#                       (error_failures) or by a failed Newton iteration
+#                       (convergence_failures)
+#   rhs, jac, lu        right-hand side and Jacobian evaluations, LU
+#                       factorisations of the Newton matrix
+#   newton              Newton iterations
+#   order, h            method order and step size of the last step
+#   time                wall time, s, of the solve and of the sections of
+#                       the right-hand side and Jacobian below; 'solver' is
+#                       the rest, the integrator itself with its linear
+#                       algebra
+#
+# Many rejected steps or LU factorisations per step point at stiffness or a
+# poor Jacobian, a large Python share of the time at overhead per call.
+# summary() puts this into a few lines of text.
+#
+# A Trace writes one CSV line per accepted step: time, step size, order and
+# the running counters. The solver then returns after every step instead of
+# at the output times, so tracing costs some Python overhead per step, but
+# it takes exactly the same steps.
+
+# Sections of the hot path
+SECTIONS = ('pack', 'schedule', 'properties', 'stencils', 'jacobian')
+
+
+class Profile(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.time = dict.fromkeys(SECTIONS, 0.0)
+        self._t = time.perf_counter()
+
+    def start(self):
+        self._t = time.perf_counter()
+
+    def lap(self, name):
+        # Charge the time since the last start or lap to section name
+        t = time.perf_counter()
+        self.time[name] += t-self._t
+        self._t = t
+
+
+def counters(vode):
+    # Solver counters from the VODE work arrays
+    iwork, rwork = vode.iwork, vode.rwork
+    return dict(steps=int(iwork[10]), rhs=int(iwork[11]), jac=int(iwork[12]),
+                lu=int(iwork[18]), newton=int(iwork[19]),
+                rejected=int(iwork[20]+iwork[21]), error_failures=int(iwork[21]),
+                convergence_failures=int(iwork[20]), order=int(iwork[13]), h=float(rwork[10]))
+
+
+def report(vode, profile, wall):
+    # Model.stats from the solver counters, the profile and the wall time of
+    # the solve
+    stats = counters(vode)
+    sections = dict(profile.time)
+    sections['solve'] = wall
+    sections['solver'] = max(wall-sum(profile.time.values()), 0.0)
+    stats['time'] = sections
+    return stats
+
+
+def summary(stats):
+    # Text summary of Model.stats
+    steps = max(stats['steps'], 1)
+    t = stats['time']
+    wall = max(t['solve'], 1E-300)
+    lines = ['%d steps (%d rejected: %d error test, %d Newton), last order %d, h = %.3g s'
+             % (stats['steps'], stats['rejected'], stats['error_failures'],
+                stats['convergence_failures'], stats['order'], stats['h']),
+             '%d RHS, %d Jacobian, %d LU, %d Newton iterations; per step %.2f RHS, %.3f LU'
+             % (stats['rhs'], stats['jac'], stats['lu'], stats['newton'],
+                stats['rhs']/float(steps), stats['lu']/float(steps)),
+             'wall %.3f s, %.1f us per RHS:' % (wall, 1E6*wall/max(stats['rhs'], 1))]
+    for name in SECTIONS+('solver',):
+        lines.append('  %-10s %8.3f s %5.1f%%' % (name, t[name], 100*t[name]/wall))
+    return '\n'.join(lines)
+
+
+class Trace(object):
+
+    COLUMNS = ('t', 'h', 'order', 'steps', 'rejected', 'rhs', 'jac', 'lu', 'wall')
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = open(path, 'w')
+        self.fh.write(','.join(self.COLUMNS)+'\n')
+        self._t0 = time.perf_counter()
+
+    def step(self, f):
+        # Record the step f has just taken
+        c = counters(f._integrator)
+        self.fh.write('%.17g,%.6g,%d,%d,%d,%d,%d,%d,%.6f\n'
+                      % (f.t, c['h'], c['order'], c['steps'], c['rejected'],
+                         c['rhs'], c['jac'], c['lu'], time.perf_counter()-self._t0))
+
+    def close(self):
+        if self.fh is not None:
+            self.fh.close()
+            self.fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
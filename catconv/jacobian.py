@@ -0,0 +1,210 @@
+import numpy as np
+
+from catconv.stencils import radial_weights
+
+# Analytic Jacobian of the transient monolith model.
+#
+# The structure is fixed by the grid: axial neighbours in the gas and in the
+# washcoat, radial neighbours in the washcoat, the gas/washcoat coupling at
+# jj = 0 and a local 4x4 block per washcoat cell for the reaction source terms.
+# It is enumerated once as a list of (row, col) index arrays, one entry per
+# term, in the field-major state ordering of layout.Layout:
+#   gas      (k, i)      -> k*nz + i
+#   washcoat (k, i, jj)  -> 4*nz + (k*nz + i)*ns + jj
+# with k = CO, CO2, C3H8, temperature, and, when the layout has the
+# cordierite, its own block behind them: radial and axial neighbours in the
+# substrate and the coupling of its first node with the washcoat wall node
+#   cordierite (i, j)    -> 4*nz*(1+ns) + i*nu + j
+# An evaluation only computes the term
+# values as whole-array expressions and scatters them with one bincount, so
+# its cost grows linearly with the number of grid nodes.
+#
+# VODE only accepts banded Jacobians, and in field-major order the
+# gas/washcoat and kinetic couplings span most of the state. For the solver
+# the unknowns are therefore reordered node by node along the channel
+# (perm), which gives a bandwidth of one axial node block, 4 + 4*ns + nu.
+#
+# With leading batch axes (lead) the states of nb = prod(lead) independent
+# members are stacked one after the other and the Jacobian is block
+# diagonal, one block per member. The coefficients passed to values() then
+# carry the same leading axes. Since every member is reordered on its own,
+# the bandwidth does not grow with nb.
+#
+# With coupled, consecutive members along the one batch axis are the radial
+# zones of a monolith cross-section (crosssection.CrossSection), whose
+# cordierite nodes conduct heat into the same nodes of the zones either
+# side. Those terms make the Jacobian block tridiagonal over the zones; they
+# are in csr(), but lie a whole member away from the diagonal, so banded()
+# leaves them out and the solver's iteration matrix stays one band per zone.
+# Only their share of the diagonal is kept.
+
+
+class Jacobian(object):
+
+    def __init__(self, lay, dz, s, lead=(), du=None, coupled=False):
+        nz = self.nz = lay.nz
+        ns = self.ns = lay.ns
+        nb = self.nb = int(np.prod(lead))
+        self.lead = tuple(lead)
+        self.n = nb*lay.n
+        self.dzs = dz**2
+        self.dz = dz
+        self.ds = s[1]-s[0]                 # first radial spacing, at the interface
+        self.dss = self.ds**2
+
+        G = lay.gas(np.arange(lay.n))
+        W = lay.washcoat(np.arange(lay.n))
+        nu = self.nu = lay.nu
+
+        # Boundary multipliers of the stencils (mirrored nodes count twice)
+        self.cl = np.ones(nz-1)             # gas, left neighbour
+        self.cl[-1] = 2.0
+        self.cd = np.ones((nz-1,1))         # washcoat, downstream neighbour
+        self.cd[0] = 2.0
+        self.cu = np.ones((nz-1,1))         # washcoat, upstream neighbour
+        self.cu[-1] = 2.0
+        left, centre, right = radial_weights(s)
+        self.wl = left[1:]                  # radial left neighbour, columns 1..ns-1
+        self.wc = centre[1:]                # radial diagonal, columns 1..ns-1
+        self.wr = right[1:-1]               # radial right neighbour, columns 1..ns-2
+
+        src_rows = np.broadcast_to(W[:,None], (4,4,nz,ns))
+        src_cols = np.broadcast_to(W[None,:], (4,4,nz,ns))
+        terms = [
+            (G, G),                                   # gas diagonal
+            (G[:,:-1], G[:,1:]),                      # gas downstream
+            (G[:,1:], G[:,:-1]),                      # gas upstream
+            (G, W[:,:,0]),                            # gas <- washcoat surface
+            (W, W),                                   # washcoat axial diagonal
+            (W[:,:-1], W[:,1:]),                      # washcoat downstream
+            (W[:,1:], W[:,:-1]),                      # washcoat upstream
+            (W[...,1:], W[...,1:]),                   # radial diagonal
+            (W[...,1:-1], W[...,2:]),                 # radial towards the wall
+            (W[...,1:], W[...,:-1]),                  # radial towards the gas
+            (W[...,0], W[...,0]),                     # interface diagonal
+            (W[...,0], W[...,1]),                     # interface, first node
+            (W[...,0], G),                            # interface <- gas
+            (src_rows, src_cols),                     # local source blocks
+        ]
+        if nu > 0:
+            C = lay.cordierite(np.arange(lay.n))[0]
+            Tw = W[3,:,-1]
+            self.dus = du**2
+            self.cw = np.ones(nu)               # cordierite, inner neighbour
+            self.cw[-1] = 2.0
+            terms += [
+                (Tw, Tw),                             # interface diagonal
+                (Tw, C[:,0]),                         # interface <- cordierite
+                (C, C),                               # cordierite diagonal
+                (C[:,:-1], C[:,1:]),                  # radial towards the mid-plane
+                (C[:,1:], C[:,:-1]),                  # radial towards the washcoat
+                (C[:,0], Tw),                         # first node <- interface
+                (C[:-1], C[1:]),                      # cordierite downstream
+                (C[1:], C[:-1]),                      # cordierite upstream
+            ]
+        self.shapes = [np.shape(r) for r,c in terms]
+        offset = lay.n*np.arange(nb)[:,None]
+        rows = [(np.ravel(r)+offset).ravel() for r,c in terms]
+        cols = [(np.ravel(c)+offset).ravel() for r,c in terms]
+        self.local = sum(r.size for r in rows)  # terms within a member
+        self.coupled = coupled and nu > 0 and nb > 1
+        if self.coupled:
+            # cordierite of every zone <- the next and the previous zone
+            C = lay.cordierite(np.arange(lay.n))[0].ravel()
+            inner = (C+offset[:-1]).ravel()
+            outer = (C+offset[1:]).ravel()
+            rows += [inner, outer]
+            cols += [outer, inner]
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+
+        # CSR structure with duplicates summed
+        key, self.slot = np.unique(rows*self.n+cols, return_inverse=True)
+        self.indices = key % self.n
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(key//self.n, minlength=self.n))))
+        self.nnz = key.size
+
+        # Node-major solver ordering: z = y[perm], y = z[iperm]
+        C = lay.cordierite(np.arange(lay.n))[0] if nu > 0 else np.zeros((nz,0), dtype=int)
+        perm = np.concatenate([np.concatenate((G[:,i], W[:,i].ravel(), C[i])) for i in range(nz)])
+        self.perm = (perm+offset).ravel()
+        self.iperm = np.argsort(self.perm)
+        zr = self.iperm[rows[:self.local]]
+        zc = self.iperm[cols[:self.local]]
+        self.lband = int(np.max(zr-zc))
+        self.uband = int(np.max(zc-zr))
+        self.bslot = (zr-zc+self.uband)*self.n+zc
+
+    def values(self, Dig, v, kmg4, Des, kms, wf, dsrc, Du=None, kw=None, cx=None):
+        # Term values in the order of the structure built in __init__.
+        #   Dig, kmg4, kms (4,nz) - gas dispersion, gas and washcoat side
+        #                           transfer coefficients (as used in pde)
+        #   v (nz,)               - gas velocity
+        #   Des (4,nz,ns)         - washcoat diffusivities
+        #   wf (4,1,1)            - scaling of the washcoat balances, per field
+        #                           or per node (4,nz,ns)
+        #   dsrc (4,4,nz,ns)      - d(source_k)/d(field_l) in each cell
+        #   Du (nz,nu), kw (nz,)  - cordierite diffusivity and interface
+        #                           conductance, with the cordierite only
+        #   cx (2,nb)             - conduction factors of every zone towards
+        #                           the next and the previous one, coupled
+        #                           only
+        # each with the leading batch axes in front when lead is set.
+        dzs, dss, ds = self.dzs, self.dss, self.ds
+        v = v[...,None,:]
+        wf2 = wf[...,0]
+        Dw = wf*Des
+        Dw0 = Dw[...,0]
+        vals = [
+            -2.0*Dig/dzs-v/self.dz-kmg4,
+            Dig[...,:-1]/dzs,
+            Dig[...,1:]*self.cl/dzs+v[...,1:]/self.dz,
+            kmg4,
+            Dw*(-2.0/dzs),
+            Dw[...,:-1,:]*self.cd/dzs,
+            Dw[...,1:,:]*self.cu/dzs,
+            Dw[...,1:]*self.wc,
+            Dw[...,1:-1]*self.wr,
+            Dw[...,1:]*self.wl,
+            -4.0*Dw0/dss-wf2*kms/ds,
+            4.0*Dw0/dss,
+            wf2*kms/ds,
+            wf[...,:,None,:,:]*dsrc,
+        ]
+        if self.nu > 0:
+            dus = self.dus
+            diag = Du*(-2.0/dus-2.0/dzs)
+            if self.coupled:
+                diag = diag-Du*(cx[0]+cx[1])[:,None,None]
+            vals += [
+                -kw,
+                kw,
+                diag,
+                Du[...,:-1]/dus,
+                Du[...,1:]*self.cw[1:]/dus,
+                Du[...,0]*self.cw[0]/dus,
+                Du[...,:-1,:]*self.cd/dzs,
+                Du[...,1:,:]*self.cu/dzs,
+            ]
+        vals = [np.broadcast_to(a, self.lead+shape).ravel() for a, shape in zip(vals, self.shapes)]
+        if self.coupled:
+            vals += [(Du[:-1]*cx[0,:-1,None,None]).ravel(), (Du[1:]*cx[1,1:,None,None]).ravel()]
+        return np.concatenate(vals)
+
+    def csr(self, *args):
+        # Jacobian in the field-major state ordering as a CSR matrix
+        import scipy.sparse
+        data = np.bincount(self.slot, weights=self.values(*args), minlength=self.nnz)
+        return scipy.sparse.csr_matrix((data, self.indices, self.indptr), shape=(self.n,self.n))
+
+    def banded(self, *args):
+        # Jacobian in the node-major solver ordering, packed for VODE:
+        # Jb[i-j+uband, j] = dF_i/dz_j, without the terms between zones
+        Jb = np.bincount(self.bslot, weights=self.values(*args)[:self.local],
+                         minlength=(self.lband+self.uband+1)*self.n)
+        return Jb.reshape(self.lband+self.uband+1, self.n)
+
+    def sparsity(self):
+        # Sparsity pattern (field-major), e.g. for grouped finite differences
+        import scipy.sparse
+        return scipy.sparse.csr_matrix((np.ones(self.nnz), self.indices, self.indptr), shape=(self.n,self.n))
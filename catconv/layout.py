@@ -0,0 +1,73 @@
+import numpy as np
+
+# Layout of the state vector of the transient model. Each block is stored
+# field major, one contiguous run per field:
+#   gas        Ya, Yb, Yc, Tk        (4, nz)
+#   washcoat   Yas, Ybs, Ycs, Tks    (4, nz, ns)
+#   cordierite Tku                   (nz, nu), only present when nu > 0
+# Every offset and length follows from the grid sizes. The accessors return
+# views that share memory with y and keep any leading batch axes, so the same
+# calls unpack a single state (n,) or a stored history (nt, n).
+
+
+class Layout(object):
+
+    gas_fields = ('Ya', 'Yb', 'Yc', 'Tk')
+    washcoat_fields = ('Yas', 'Ybs', 'Ycs', 'Tks')
+    cordierite_fields = ('Tku',)
+
+    def __init__(self, nz, ns, nu=0):
+        self.nz = nz
+        self.ns = ns
+        self.nu = nu
+
+        # Species and temperature fields of the state
+        self.species_fields = self.gas_fields[:3]+self.washcoat_fields[:3]
+        self.temperature_fields = self.gas_fields[3:]+self.washcoat_fields[3:]
+        if nu > 0:
+            self.temperature_fields += self.cordierite_fields
+
+        blocks = [('gas', self.gas_fields, (nz,)),
+                  ('washcoat', self.washcoat_fields, (nz,ns))]
+        if nu > 0:
+            blocks.append(('cordierite', self.cordierite_fields, (nz,nu)))
+
+        # Offsets of the blocks and of every field within them
+        self.shapes = {}
+        self.slices = {}
+        self.offsets = {}
+        n = 0
+        for name, fields, shape in blocks:
+            size = int(np.prod(shape))
+            self.shapes[name] = (len(fields),)+shape
+            self.slices[name] = slice(n, n+len(fields)*size)
+            for field in fields:
+                self.offsets[field] = n
+                self.slices[field] = slice(n, n+size)
+                self.shapes[field] = shape
+                n += size
+        self.n = n
+
+    def view(self, y, name):
+        # Block or field name of y as an array of its grid shape
+        y = np.asarray(y)
+        return y[...,self.slices[name]].reshape(y.shape[:-1]+self.shapes[name])
+
+    def gas(self, y):
+        return self.view(y, 'gas')
+
+    def washcoat(self, y):
+        return self.view(y, 'washcoat')
+
+    def cordierite(self, y):
+        return self.view(y, 'cordierite')
+
+    def pack(self, Yg, Ysw, Tku=None):
+        # State vector from the stacked gas (4,nz), washcoat (4,nz,ns) and,
+        # when the layout has one, cordierite (nz,nu) fields
+        y = np.zeros(self.n)
+        self.gas(y)[...] = Yg
+        self.washcoat(y)[...] = Ysw
+        if 'cordierite' in self.slices:
+            self.cordierite(y)[...] = Tku
+        return y
@@ -0,0 +1,286 @@
+import hashlib
+
+import numpy as np
+
+# Surface reaction mechanisms as data.
+#
+# A mechanism lists its species, Arrhenius constants k = pre*exp(act/T),
+# reactions and inhibition factors, and is compiled once into exponent,
+# index and coefficient arrays. Every reaction rate has the form
+#
+#   r_j = scale * k_j(T) * prod_s Y_s**a_js / G,   G = prod_f (1 + S_f)**n_f,
+#
+# where each inhibition factor sums terms S_f = sum_m k_m(T) * prod_s Y_s**b_ms.
+# Species are either part of the washcoat state, in the field order of the
+# model, or fixed, with mole fractions given at evaluation time (oxygen is in
+# such excess that the model holds it constant). Reactions carry their
+# stoichiometry over the state species and a heat of reaction polynomial in T.
+#
+# rates() evaluates all reactions of all cells with a fixed number of
+# whole-array operations, however many reactions and terms there are, and
+# derivatives() gives the exact derivatives of the rates with respect to the
+# state species and T at the same point. sources() and dsources() contract
+# them with the stoichiometry and the heats of reaction into the species
+# production rates and the heat release, and their derivatives. Cells are
+# flattened on the last axis; any leading batch axes are kept.
+
+
+class Reaction(object):
+
+    def __init__(self, constant, orders, stoich, heat):
+        # constant - name of the rate constant
+        # orders   - {species: reaction order}, state and fixed species
+        # stoich   - {species: stoichiometric coefficient}, state species
+        # heat     - heat of reaction polynomial in T, J/mol, constant first
+        self.constant = constant
+        self.orders = dict(orders)
+        self.stoich = dict(stoich)
+        self.heat = tuple(np.atleast_1d(heat))
+
+
+class Inhibition(object):
+
+    def __init__(self, terms, power=1):
+        # terms - list of (constant, {species: order}), each adding
+        #         k*prod Y**order to the factor 1 + ...
+        # power - exponent of the factor
+        self.terms = [(k, dict(orders)) for k, orders in terms]
+        self.power = power
+
+
+class Mechanism(object):
+
+    def __init__(self, species, constants, reactions, inhibition=(), fixed=None):
+        # species    - state species in field order
+        # constants  - list of (name, pre, act) of the Arrhenius constants
+        # reactions  - list of Reaction
+        # inhibition - list of Inhibition, the factors of G
+        # fixed      - {species: default mole fraction} of the fixed species
+        self.species = tuple(species)
+        self.fixed = dict(fixed or {})
+        self.constants = [name for name, pre, act in constants]
+        self.reactions = list(reactions)
+        self.inhibition = list(inhibition)
+        self.nr = len(self.reactions)
+        fixed_names = sorted(self.fixed)
+        self.fixed_names = tuple(fixed_names)
+        nsp, nfx = len(self.species), len(fixed_names)
+
+        self.pre = np.array([pre for name, pre, act in constants], dtype=float)
+        self.act = np.array([act for name, pre, act in constants], dtype=float)
+
+        # Monomials k_m*prod Y**P_m: the reactions, then the inhibition terms
+        monomials = [(r.constant, r.orders) for r in self.reactions]
+        factor = []
+        for f, inh in enumerate(self.inhibition):
+            monomials += inh.terms
+            factor += [f]*len(inh.terms)
+        nm = len(monomials)
+        self.kidx = np.zeros(nm, dtype=int)
+        self.P = np.zeros((nm, nsp))
+        self.Pf = np.zeros((nm, nfx))
+        for m, (k, orders) in enumerate(monomials):
+            if k not in self.constants:
+                raise ValueError('unknown rate constant %r' % k)
+            self.kidx[m] = self.constants.index(k)
+            for name, a in orders.items():
+                if name in self.species:
+                    self.P[m, self.species.index(name)] = a
+                elif name in self.fixed:
+                    self.Pf[m, fixed_names.index(name)] = a
+                else:
+                    raise ValueError('unknown species %r' % name)
+
+        # Derivatives dM_m/dY_s = P_ms*prod_t Y_t**E_pt are only formed for
+        # the pairs p = (m, s) with P_ms > 0
+        pm, ps = np.nonzero(self.P)
+        npair = len(pm)
+        self.pm = pm
+        self.pcoef = self.P[pm,ps][:,None]
+        self.E = self.P[pm]-np.eye(nsp)[ps]
+
+        # Whole-number orders are taken from a table of the powers Y**0 ..
+        # Y**emax built by repeated multiplication and gathered at flat
+        # (species, exponent) indices; other orders fall back to np.power
+        self.integer = bool(np.all(self.P == np.round(self.P)) and np.all(self.P >= 0))
+        if self.integer:
+            self.emax = int(max(self.P.max(), 1)) if nm else 1
+            self.Pi = (np.arange(nsp)*(self.emax+1)+self.P.astype(int)).ravel()
+            self.Ei = (np.arange(nsp)*(self.emax+1)+self.E.astype(int)).ravel()
+
+        # Sums of the pair derivatives per species, and their places in the
+        # rate derivatives (reaction, species) flattened
+        self.Sg = np.zeros((nsp, npair))
+        self.Sg[ps, np.arange(npair)] = 1.0
+        self.Sr = np.zeros((self.nr*nsp, npair))
+        for q in np.flatnonzero(pm < self.nr):
+            self.Sr[pm[q]*nsp+ps[q], q] = 1.0
+
+        self.set_constants(self.pre, self.act)
+
+        # Inhibition factors as sums over the monomials
+        self.F = np.zeros((len(self.inhibition), nm))
+        self.F[factor, np.arange(self.nr, nm)] = 1.0
+        self.power = np.array([inh.power for inh in self.inhibition], dtype=float).reshape(-1,1)
+        self.FT = self.F.T.copy()
+        # G as the product of the factors repeated by whole-number powers
+        if np.all(self.power == np.round(self.power)) and np.all(self.power >= 0):
+            self.gidx = np.repeat(np.arange(len(self.inhibition)), self.power[:,0].astype(int))
+        else:
+            self.gidx = None
+
+        # Stoichiometry (species, reaction) and heat polynomials (reaction, power)
+        self.stoich = np.zeros((nsp, self.nr))
+        for j, r in enumerate(self.reactions):
+            for name, nu in r.stoich.items():
+                if name not in self.species:
+                    raise ValueError('stoichiometry of %r, which is not a state species' % name)
+                self.stoich[self.species.index(name), j] = nu
+        deg = max([len(r.heat) for r in self.reactions] or [1])
+        self.heat = np.zeros((self.nr, deg))
+        for j, r in enumerate(self.reactions):
+            self.heat[j,:len(r.heat)] = r.heat
+
+        # One matrix for production rates and heat release: rows stoich @ r,
+        # then sum_j heat[j,q]*r_j per power q of T
+        self.A = np.vstack((self.stoich, self.heat.T))
+        self.qpow = np.arange(1, deg)[:,None]
+
+    def set_constants(self, pre, act):
+        # Arrhenius constants in the order of constants, (nk,) or lead+(nk,)
+        # to give every batch member its own
+        self.pre = np.asarray(pre, dtype=float)
+        self.act = np.asarray(act, dtype=float)
+        self.act_m = self.act[...,self.kidx][...,None]
+        self.pre_m = self.pre[...,self.kidx]
+        self._fixed = None
+
+    def digest(self):
+        # Hash of the species, the constants as set, the monomials, the
+        # inhibition and the stoichiometry, e.g. to tell whether a
+        # checkpoint was made with this mechanism
+        h = hashlib.sha256(repr((self.species, sorted(self.fixed.items()), self.constants)).encode())
+        for a in (self.pre, self.act, self.kidx, self.P, self.Pf, self.F, self.power, self.stoich, self.heat):
+            h.update(repr(a.shape).encode())
+            h.update(np.ascontiguousarray(a, dtype=float).tobytes())
+        return h.hexdigest()
+
+    def _powers(self, Y):
+        # Y**e for e = 0 .. emax, lead+(nsp*(emax+1), c)
+        table = np.empty(Y.shape[:-1]+(self.emax+1,)+Y.shape[-1:])
+        table[...,0,:] = 1.0
+        table[...,1,:] = Y
+        for e in range(2, self.emax+1):
+            np.multiply(table[...,e-1,:], Y, out=table[...,e,:])
+        return table.reshape(Y.shape[:-2]+(-1,)+Y.shape[-1:])
+
+    def rates(self, T, Y, fixed, scale=1.0):
+        # Rates lead+(nr, c) at T lead+(c,) and state species Y lead+(nsp, c),
+        # with the fixed species mole fractions in the order of fixed_names,
+        # each a scalar or of the leading shape of Y for per-member values
+        try:
+            fixed = np.array(fixed, dtype=float)
+        except ValueError:
+            # scalars and arrays mixed
+            fixed = np.array(np.broadcast_arrays(*fixed))
+        if fixed.ndim > 1:
+            lead = Y.shape[:-2]
+            if np.broadcast_shapes(fixed.shape[1:], lead) != lead:
+                raise ValueError('fixed mole fractions of shape %s for batch axes %s' % (fixed.shape[1:], lead))
+            fixed = np.moveaxis(fixed, 0, -1)
+        if self._fixed is None or fixed.shape != self._fixed.shape or not (fixed == self._fixed).all():
+            cf = np.prod(fixed[...,None,:]**self.Pf, axis=-1)
+            self._cm = (self.pre_m*cf)[...,None]
+            self._fixed = fixed.copy()
+        km = np.exp(self.act_m/T[...,None,:])
+        km *= self._cm
+        if self.integer:
+            table = self._powers(Y)
+            M = np.take(table, self.Pi, axis=-2).reshape(Y.shape[:-2]+self.P.shape+Y.shape[-1:])
+            M = np.multiply.reduce(M, axis=-2)
+        else:
+            table = None
+            M = np.prod(Y[...,None,:,:]**self.P[:,:,None], axis=-2)
+        terms = km*M
+        S = np.matmul(self.F, terms)
+        S += 1.0
+        if self.gidx is not None:
+            G = np.multiply.reduce(np.take(S, self.gidx, axis=-2), axis=-2)
+        else:
+            G = np.prod(S**self.power, axis=-2)
+        r = terms[...,:self.nr,:]*(scale/G)[...,None,:]
+        self._state = (T, Y, table, km, terms, S, G, scale, r)
+        return r
+
+    def derivatives(self):
+        # d(r_j)/d(Y_s) lead+(nr, nsp, c) and d(r_j)/dT lead+(nr, c) at the
+        # point of the last rates() call
+        T, Y, table, km, terms, S, G, scale, r = self._state
+        lead, c = Y.shape[:-2], Y.shape[-1:]
+        if self.integer:
+            dM = np.take(table, self.Ei, axis=-2).reshape(lead+self.E.shape+c)
+            dM = np.multiply.reduce(dM, axis=-2)
+        else:
+            dM = np.prod(Y[...,None,:,:]**self.E[:,:,None], axis=-2)
+        dM *= self.pcoef
+        dterms = np.take(km, self.pm, axis=-2)*dM
+        wm = np.matmul(self.FT, self.power/S)               # sum of n_f/S_f over the factors of m
+        dlnG = np.matmul(self.Sg, np.take(wm, self.pm, axis=-2)*dterms)
+        dY = np.matmul(self.Sr, dterms).reshape(lead+(self.nr, len(self.species))+c)
+        dY *= (scale/G)[...,None,None,:]
+        dY -= r[...,None,:]*dlnG[...,None,:,:]
+
+        dlnk = self.act_m/T[...,None,:]**2
+        np.negative(dlnk, out=dlnk)
+        dlnGT = np.sum(wm*terms*dlnk, axis=-2)
+        dT = r*(dlnk[...,:self.nr,:]-dlnGT[...,None,:])
+        return dY, dT
+
+    def sources(self, T, Y, fixed, scale=1.0):
+        # Rates r lead+(nr, c), production rates stoich @ r lead+(nsp, c) and
+        # heat release sum_j r_j*dH_j(T) lead+(c,)
+        r = self.rates(T, Y, fixed, scale)
+        nsp = len(self.species)
+        Tp = np.empty(T.shape[:-1]+(self.heat.shape[1],)+T.shape[-1:])
+        Tp[...,0,:] = 1.0
+        for q in range(1, Tp.shape[-2]):
+            np.multiply(Tp[...,q-1,:], T, out=Tp[...,q,:])
+        a = np.matmul(self.A, r)
+        q = np.sum(Tp*a[...,nsp:,:], axis=-2)
+        self._sources = (Tp, a)
+        return r, a[...,:nsp,:], q
+
+    def dsources(self):
+        # Derivatives at the point of the last sources() call of the
+        # production rates, lead+(nsp, nsp, c) with respect to the species
+        # and lead+(nsp, c) to T, and of the heat release, lead+(nsp, c) and
+        # lead+(c,)
+        Tp, a = self._sources
+        dY, dT = self.derivatives()
+        nsp = len(self.species)
+        c = dT.shape[-1:]
+        lead = dT.shape[:-2]
+        aY = np.matmul(self.A, dY.reshape(lead+(self.nr, nsp*c[0]))).reshape(lead+(-1, nsp)+c)
+        aT = np.matmul(self.A, dT)
+        qY = np.sum(Tp[...,None,:]*aY[...,nsp:,:,:], axis=-3)
+        qT = np.sum(Tp*aT[...,nsp:,:], axis=-2)+np.sum(self.qpow*Tp[...,:-1,:]*a[...,nsp+1:,:], axis=-2)
+        return aY[...,:nsp,:,:], aT[...,:nsp,:], qY, qT
+
+
+def lhhw(p):
+    # CO and C3H8 oxidation on Pt with Langmuir-Hinshelwood-Hougen-Watson
+    # inhibition; constants k1 .. k5 from Parameters p
+    names = ['k1', 'k2', 'k3', 'k4', 'k5']
+    return Mechanism(
+        species=('CO', 'CO2', 'C3H8'),
+        fixed={'O2': p.YO2},
+        constants=list(zip(names, p.pre, p.act)),
+        reactions=[
+            Reaction('k1', {'CO': 1, 'O2': 1}, {'CO': -1, 'CO2': 1}, heat=-282.55E3),
+            Reaction('k3', {'C3H8': 1, 'O2': 1}, {'C3H8': -1, 'CO2': 1},
+                     heat=(-2.059E6, 72.3, -9.69E-2, 4.34E-5, 7.56e-9)),
+        ],
+        inhibition=[
+            Inhibition([('k2', {'CO': 1}), ('k4', {'C3H8': 1})], power=2),
+            Inhibition([('k5', {'CO': 2, 'C3H8': 2})]),
+        ])
@@ -0,0 +1,164 @@
+import numpy as np
+
+from catconv.parameters import Parameters
+from catconv.properties import M
+from catconv.schedule import lightoff_programme
+from catconv.store import Store
+
+# Outlet metrics of transient runs.
+#
+# Everything is computed from the outlet gas node and the entering
+# conditions over the output times, as whole-array expressions over the time
+# axis and any number of run axes behind it, so one call covers a single
+# run, an ensemble or a stack of runs:
+#
+#   COconv, HCconv   outlet conversions
+#   rCO, rHC         reaction rates, mol/s, Mflow*(Ye-Y)
+#   r2CO, r2HC       the same per slice volume, mol/(s.m^3)
+#   mCO, mHC         cumulative mass emitted at the outlet, g, the
+#                    trapezoidal integral of Mflow*Y*M over time
+#   Tke              entering gas temperature
+#   lightoff         entering temperatures at which the conversions first
+#                    reach each of levels, interpolated linearly between
+#                    output steps, (len(levels),)+runs per species
+#   extinction       entering temperatures at which they last fall below
+#                    each level
+#
+# A level never reached, or never left again, gives NaN. The entering
+# conditions come from the run's schedule, the light-off programme from
+# p.Tke by default, and from p for the channels it does not have.
+#
+# store() reads a result store chunk by chunk and keeps only the outlet
+# node of the gas fields, so stores of long runs or large ensembles are
+# never loaded whole; stores() does the same for many stores of the same
+# output times and stacks them along a run axis.
+#
+#   out = metrics.store('results', p)
+#   out['lightoff']['CO']                 # T50, T90 of CO, K
+
+LEVELS = (0.5, 0.9)
+
+
+def entering(t, p=None, schedule=None):
+    # Entering Yae, Yce, Tke and Mflow at the times t, each (len(t),) or
+    # (len(t),)+lead for the per-member channels of an ensemble schedule
+    if p is None:
+        p = Parameters()
+    if schedule is None:
+        schedule = lightoff_programme(p.Tke)
+    values = schedule.sample(t)
+    t = np.asarray(t, dtype=float)
+    return dict((name, values[name] if name in values else np.full(t.shape, float(getattr(p, name))))
+                for name in ('Yae', 'Yce', 'Tke', 'Mflow'))
+
+
+def crossings(T, conv, levels=LEVELS):
+    # Light-off and extinction temperatures of conversions conv against
+    # the entering temperatures T, both (nt,)+runs; each
+    # (len(levels),)+runs
+    T, conv = np.broadcast_arrays(T, conv)
+    nt = len(conv)
+    lightoff = []
+    extinction = []
+    for level in levels:
+        above = conv >= level
+        reached = above.any(axis=0)
+
+        # first step at or above the level, from the step before it
+        k = np.clip(np.argmax(above, axis=0), 1, nt-1)
+        lightoff.append(np.where(reached & ~above[0], _between(T, conv, k-1, k, level), np.nan))
+
+        # last step at or above the level, to the step after it
+        k = np.clip(nt-1-np.argmax(above[::-1], axis=0), 0, nt-2)
+        extinction.append(np.where(reached & ~above[-1], _between(T, conv, k, k+1, level), np.nan))
+    return np.array(lightoff), np.array(extinction)
+
+
+def _between(T, conv, k0, k1, level):
+    # T where conv passes level between the steps k0 and k1 of every run
+    T0 = np.take_along_axis(T, k0[None], 0)[0]
+    T1 = np.take_along_axis(T, k1[None], 0)[0]
+    c0 = np.take_along_axis(conv, k0[None], 0)[0]
+    c1 = np.take_along_axis(conv, k1[None], 0)[0]
+    d = np.where(c1 != c0, c1-c0, 1.0)
+    return T0+np.clip((level-c0)/d, 0.0, 1.0)*(T1-T0)
+
+
+def metrics(t, Ya, Yc, inlet, p=None, levels=LEVELS):
+    # Metrics of the outlet CO and C3H8 fractions Ya, Yc (nt,)+runs, with
+    # inlet the entering() values broadcastable to them
+    if p is None:
+        p = Parameters()
+    t = np.asarray(t, dtype=float)
+    Yae, Yce, Tke, Mflow = [np.asarray(inlet[name], dtype=float) for name in ('Yae', 'Yce', 'Tke', 'Mflow')]
+    # inlet values per step, or per step and run, against (nt,)+runs
+    shape = np.shape(Ya)
+    Yae, Yce, Tke, Mflow = [np.broadcast_to(a.reshape(a.shape+(1,)*(len(shape)-a.ndim)), shape)
+                            for a in (Yae, Yce, Tke, Mflow)]
+
+    out = dict(t=t, Tke=Tke,
+               COconv=(Yae-Ya)/Yae, HCconv=(Yce-Yc)/Yce,
+               rCO=Mflow*(Yae-Ya), rHC=Mflow*(Yce-Yc))
+    out['r2CO'] = out['rCO']/p.V_slice
+    out['r2HC'] = out['rHC']/p.V_slice
+
+    # cumulative emitted mass, trapezoidal in time
+    dt = np.diff(t).reshape((-1,)+(1,)*(len(shape)-1))
+    for name, Y, Mi in (('mCO', Ya, M[0]), ('mHC', Yc, M[2])):
+        flow = Mflow*Y*Mi
+        m = np.zeros(shape)
+        np.cumsum(0.5*dt*(flow[1:]+flow[:-1]), axis=0, out=m[1:])
+        out[name] = m
+
+    out['levels'] = np.array(levels)
+    out['lightoff'] = {}
+    out['extinction'] = {}
+    for species, conv in (('CO', out['COconv']), ('HC', out['HCconv'])):
+        out['lightoff'][species], out['extinction'][species] = crossings(Tke, conv, levels)
+    return out
+
+
+def outlet(lay, Y):
+    # Outlet values of the gas fields Ya, Yb, Yc, Tk of states Y (..., n),
+    # each of the leading shape of Y
+    return tuple(np.moveaxis(np.array(lay.gas(Y)[...,-1]), -1, 0))
+
+
+def store(path, p=None, schedule=None, levels=LEVELS):
+    # metrics() of the result store at path (or a store.Store), read chunk
+    # by chunk. An ensemble store gives run axes (N,); its schedule should
+    # carry the per-member channels.
+    s = path if isinstance(path, Store) else Store(path)
+    t = []
+    Ya = []
+    Yc = []
+    for tc, y in s.chunks():
+        a, b, c, Tk = outlet(s.lay, y)
+        t.append(tc)
+        Ya.append(a)
+        Yc.append(c)
+    t = np.concatenate(t)
+    return metrics(t, np.concatenate(Ya), np.concatenate(Yc), entering(t, p, schedule), p, levels)
+
+
+def stores(paths, p=None, schedule=None, levels=LEVELS):
+    # metrics() of many stores of the same output times at once, stacked
+    # along a run axis behind time; schedule is shared or one per store
+    schedules = schedule if isinstance(schedule, (list, tuple)) else [schedule]*len(paths)
+    t = None
+    Ya = []
+    Yc = []
+    inlet = []
+    for path, sch in zip(paths, schedules):
+        s = Store(path)
+        parts = [(tc, outlet(s.lay, y)) for tc, y in s.chunks()]
+        tp = np.concatenate([tc for tc, o in parts])
+        if t is None:
+            t = tp
+        elif not np.array_equal(t, tp):
+            raise ValueError('store %s has other output times' % path)
+        Ya.append(np.concatenate([o[0] for tc, o in parts]))
+        Yc.append(np.concatenate([o[2] for tc, o in parts]))
+        inlet.append(entering(t, p, sch))
+    inlet = dict((name, np.stack([e[name] for e in inlet], axis=1)) for name in inlet[0])
+    return metrics(t, np.stack(Ya, axis=1), np.stack(Yc, axis=1), inlet, p, levels)
@@ -0,0 +1,394 @@
+import hashlib
+import json
+import time
+
+import numpy as np
+
+from catconv import cache, instrument, jacobian, layout, properties, stencils, store
+from catconv.schedule import lightoff_programme
+from catconv.parameters import Parameters
+
+# Transient model of one monolith channel: axial dispersion and convection in
+# the gas, radial diffusion and LHHW reaction in the washcoat, coupled by film
+# transfer at the gas/washcoat interface. The grid sizes are free; all array
+# shapes and state offsets follow from nz (axial), ns (radial washcoat) and nu
+# (radial cordierite).
+#
+# With nu > 0 the state also holds the cordierite temperatures Tku on the
+# radial grid u from the washcoat wall to the mid-plane of the substrate
+# wall, with conduction radially and along the channel. The washcoat wall
+# node is the interface: it holds half a washcoat and half a cordierite cell
+# and exchanges heat with the first substrate node, so the substrate's heat
+# capacity slows the washcoat down through the temperature ramps. nu = 0
+# leaves the substrate out.
+#
+# The entering gas follows a schedule.Schedule, by default the temperature
+# programme of the light-off experiment; the integration stops on every
+# breakpoint of the schedule instead of stepping across it. Long runs can be
+# checkpointed and resumed, see checkpoint.Checkpoint.
+
+
+class Model(object):
+
+    def __init__(self, p=None, nz=5, ns=5, nu=3, lead=(), schedule=None, z0=0.0):
+        # lead     - leading batch axes of the state, see ensemble.Ensemble
+        # schedule - schedule.Schedule of the entering conditions, the
+        #            light-off programme from inlet Tke by default
+        # z0       - distance of the slice from the channel entrance, for a
+        #            slice further down the channel, see monolith.Monolith
+        if p is None:
+            p = Parameters()
+        self.p = p
+        self.nz = nz
+        self.ns = ns
+        self.nu = nu
+        self.lay = layout.Layout(nz, ns, nu)
+        self.lead = tuple(lead)
+        self.shape = self.lead+(self.lay.n,)
+
+        #Grids
+        self.dz = p.zl/nz                       # axial direction
+        self.z = z0+np.linspace(self.dz, p.zl, nz)
+        self.s = stencils.washcoat_grid(p.s0, ns, p.s_ratio)   # radial direction solid,
+        self.ds = self.s[1]-self.s[0]                           # graded towards the gas
+        self.du = p.u0/nu if nu > 0 else 0.0    # radial direction cordierite
+        self.u = np.linspace(self.du, p.u0, nu)
+
+        self.fd = stencils.Stencils(nz, ns, self.dz, self.s, lead=self.lead+(4,),
+                                    u=self.u if nu > 0 else None)
+        self.pr = properties.Properties(nz, ns, self.dz, p, lead=self.lead, z0=z0, nu=nu)
+        self.J = jacobian.Jacobian(self.lay, self.dz, self.s, lead=self.lead, du=self.du)
+
+        # Initial and entering values per field, Ya/Yb/Yc/Tk
+        self.init = np.zeros(self.lead+(4,))
+        self.init[...] = [p.Ya0, p.Yb0, p.Yc0, p.Tk0]
+        self.inlet = np.zeros(self.lead+(4,))
+        self.inlet[...] = [p.Yae, p.Ybe, p.Yce, p.Tke]
+
+        self.schedule = schedule
+        self._programme = None
+        self.Yge = np.zeros(self.lead+(4,))     # entering values at time t
+        self.wf = np.array([1/p.por, 1/p.por, 1/p.por, 1.0]).reshape(4,1,1)   # species balances are per pore volume
+        self.dYi = np.zeros(self.lead+(4,nz))   # gas minus washcoat surface values
+        self.kmg4 = np.zeros(self.lead+(4,nz))  # gas side transfer, scaled per channel volume
+        self.y1 = np.zeros(self.shape)          # time derivatives, packed like y
+        self.Ygt = self.lay.gas(self.y1)
+        self.Yst = self.lay.washcoat(self.y1)
+        self.Yst0 = self.Yst[...,0]
+        if nu > 0:
+            # washcoat balances scaled per node, the wall node shares its
+            # capacity with the substrate
+            self.wfn = np.zeros(self.lead+(4,nz,ns))
+            self.wfn[...] = self.wf
+            self.Tstw = self.Yst[...,3,:,-1]
+            self.Tut = self.lay.cordierite(self.y1)[...,0,:,:]
+        self.stats = {}                         # report of the last solve, see instrument
+        self.profile = instrument.Profile()
+
+    def initial(self):
+        # Uniform initial state of the slice
+        y = np.zeros(self.shape)
+        self.lay.gas(y)[...] = self.init[...,None]
+        self.lay.washcoat(y)[...] = self.init[...,None,None]
+        if self.nu > 0:
+            self.lay.cordierite(y)[...] = self.init[...,3,None,None,None]
+        return y
+
+    def programme(self):
+        # Schedule of the entering conditions for the next solve
+        if self.schedule is not None:
+            return self.schedule
+        return lightoff_programme(self.inlet[...,3])
+
+    def breakpoints(self):
+        # Times the solver stops on rather than stepping across
+        return self._programme.breakpoints
+
+    def entering(self, t):
+        # Entering gas values Ya/Yb/Yc/Tk at time t; oxygen and flow of the
+        # schedule go to the properties
+        if self._programme is None:
+            self._programme = self.programme()
+        values = self._programme(t)
+        self.Yge[...] = self.inlet
+        for k, name in enumerate(('Yae', 'Ybe', 'Yce', 'Tke')):
+            if name in values:
+                self.Yge[...,k] = values[name]
+        pr = self.pr
+        pr.YO2 = values.get('YO2', self.p.YO2)
+        vmean = values.get('vmean', self.p.vmean)
+        if 'Mflow' in values:
+            vmean = vmean*values['Mflow']/self.p.Mflow
+        # per-member velocities (lead) along the channel axis of the gas
+        pr.vmean = np.asarray(vmean)[...,None] if np.ndim(vmean) else vmean
+        return self.Yge
+
+    def neighbours(self, t):
+        # Gas values past the outlet, washcoat and cordierite rows before the
+        # first and past the last node at time t, None where the stencils
+        # mirror; a slice of a longer channel has neighbours, see
+        # monolith.Monolith
+        return None, None, None, None, None
+
+    def pde(self, t, y):
+        # Time derivatives of the state y (field-major layout), of the shape
+        # of y, which is self.shape or flattened
+        y1 = self.rhs(t, y)
+        prof = self.profile
+        prof.start()
+        y1 = y1.reshape(np.shape(y)).copy()
+        prof.lap('pack')
+        return y1
+
+    def rhs(self, t, y):
+        # pde() into the model's own buffer, of self.shape, which the next
+        # call overwrites
+        prof = self.profile
+        prof.start()
+        y = np.reshape(y, self.shape)
+        lay, pr, fd = self.lay, self.pr, self.fd
+        Yg = lay.gas(y)                         # Ya, Yb, Yc, Tk
+        Ysw = lay.washcoat(y)                   # Yas, Ybs, Ycs, Tks
+        Tku = lay.cordierite(y)[...,0,:,:] if self.nu > 0 else None
+        dYi, kmg4, Ygt, Yst = self.dYi, self.kmg4, self.Ygt, self.Yst
+        prof.lap('pack')
+
+        # Entering conditions first, they set the oxygen and the flow the
+        # properties use
+        Yge = self.entering(t)
+        Ygo, top, bottom, utop, ubottom = self.neighbours(t)
+        prof.lap('schedule')
+
+        # Properties at the current temperatures and compositions
+        pr.update(Yg, Ysw, Tku)
+        np.multiply(pr.kg, 4.0/self.p.DH, out=kmg4)
+        prof.lap('properties')
+
+        # Gas phase
+        Ygzz, Ygz = fd.gas(Yg, Yge, Ygo)
+        np.subtract(Yg, Ysw[...,0], out=dYi)
+        np.multiply(pr.Dig, Ygzz, out=Ygt)
+        np.subtract(Ygt, pr.v[...,None,:]*Ygz, out=Ygt)
+        np.subtract(Ygt, kmg4*dYi, out=Ygt)
+
+        # Washcoat phase
+        Yslap = fd.washcoat(Ysw, top, bottom)
+        np.multiply(pr.Des, Yslap, out=Yst)
+        np.add(Yst, pr.src, out=Yst)
+        np.add(self.Yst0, fd.interface(Ysw, dYi, pr.Des, pr.ks), out=self.Yst0)
+        if Tku is None:
+            np.multiply(Yst, self.wf, out=Yst)
+        else:
+            # Cordierite, and its heat flow into the washcoat wall node
+            Tw = Ysw[...,3,:,-1]
+            self.wfn[...,3,:,-1] = pr.fw
+            np.multiply(Yst, self.wfn, out=Yst)
+            self.Tstw += pr.kw*(Tku[...,0]-Tw)
+            np.multiply(pr.Du, fd.cordierite(Tku, Tw, utop, ubottom), out=self.Tut)
+        prof.lap('stencils')
+        return self.y1
+
+    def jac_values(self, y, t=0.0, update=True):
+        # Term values of the analytic Jacobian at t, y. Transport coefficients
+        # are treated as constants, the kinetic sources are differentiated in
+        # full. update=False takes the properties of the last rhs() call,
+        # which must have been at the same t, y.
+        pr = self.pr
+        if update:
+            y = np.reshape(y, self.shape)
+            self.entering(t)
+            Tku = self.lay.cordierite(y)[...,0,:,:] if self.nu > 0 else None
+            pr.update(self.lay.gas(y), self.lay.washcoat(y), Tku)
+            np.multiply(pr.kg, 4.0/self.p.DH, out=self.kmg4)
+        if self.nu == 0:
+            return (pr.Dig, pr.v, self.kmg4, pr.Des, pr.ks, self.wf, pr.dsources())
+        self.wfn[...,3,:,-1] = pr.fw
+        return (pr.Dig, pr.v, self.kmg4, pr.Des, pr.ks, self.wfn, pr.dsources(), pr.Du, pr.kw)
+
+    def jac(self, t, y):
+        # Analytic Jacobian (field-major, block diagonal over the batch) as a
+        # CSR matrix
+        return self.J.csr(*self.jac_values(y, t))
+
+    # The solver integrates the node-major reordering zn = y[J.perm], in
+    # which the Jacobian is banded
+    def pde_node(self, t, zn):
+        prof = self.profile
+        prof.start()
+        y = zn[self.J.iperm]
+        prof.lap('pack')
+        y1 = self.pde(t, y)
+        prof.start()
+        y1 = y1[self.J.perm]
+        prof.lap('pack')
+        return y1
+
+    def jac_node(self, t, zn):
+        prof = self.profile
+        prof.start()
+        y = zn[self.J.iperm]
+        prof.lap('pack')
+        jn = self.J.banded(*self.jac_values(y, t))
+        prof.lap('jacobian')
+        return jn
+
+    def identity(self):
+        # What makes the model, as plain values: all parameters, overridden
+        # or not, the grid, the initial and entering values and the
+        # mechanism; subclasses add their own
+        return dict(model=type(self).__name__, parameters=self.p.values(), lead=self.lead,
+                    z=self.z, s=self.s, u=self.u, init=self.init, inlet=self.inlet,
+                    mechanism=self.pr.mech.digest())
+
+    def digest(self):
+        # Hash of identity(), e.g. to tell whether a checkpoint was made
+        # with this model
+        text = json.dumps(cache.canonical(self.identity()), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def tolerances(self, species=1E-8, temperature=1E-5):
+        # Absolute tolerances per state entry. Mole fractions are O(1E-3) and
+        # fall much lower inside the washcoat, temperatures are O(500 K), so
+        # a single value cannot suit both.
+        atol = np.full(self.lay.n, species)
+        for field in self.lay.temperature_fields:
+            atol[self.lay.slices[field]] = temperature
+        return atol
+
+    def steps(self, tout, y0=None, rtol=1E-5, atol=None, checkpoint=None, results=None, trace=None):
+        # Generator over the output times of one continuous solve from
+        # tout[0], yielding (t, y) with y of self.shape, field-major, and
+        # starting with tout[0], y0. VODE keeps its BDF history between calls
+        # and interpolates onto each tout[k]. atol is a scalar or per state
+        # entry, tolerances() by default.
+        #
+        # With a checkpoint.Checkpoint the solver state is saved between
+        # output steps, together with results(k), the caller's results of
+        # the first k output steps as a dict of arrays. A run resumed from a
+        # checkpoint yields only the output steps after it.
+        #
+        # self.stats is updated at every output step with the solver counters
+        # and the time spent per section, see instrument.report(); trace is
+        # an instrument.Trace, or the path of one, to record every step in.
+        if isinstance(trace, str):
+            with instrument.Trace(trace) as trace:
+                for out in self.steps(tout, y0, rtol, atol, checkpoint, results, trace):
+                    yield out
+            return
+        if y0 is None:
+            y0 = self.initial()
+        if atol is None:
+            atol = self.tolerances()
+        J = self.J
+        y0 = np.broadcast_to(y0, self.shape).ravel()
+        atol = np.broadcast_to(atol, self.shape).ravel()[J.perm]
+        f = self._integrator(y0, tout[0], rtol, atol)
+        breaks = self.breakpoints()
+        self.profile.reset()
+        wall = 0.0
+
+        digest = getattr(self._programme, 'digest', None)
+        run = dict(tout=np.asarray(tout, dtype=float), rtol=rtol, atol=atol, y0=y0,
+                   model=self.digest(), schedule=digest() if digest else '')
+        saved = checkpoint.load() if checkpoint is not None else None
+        if saved is not None:
+            checkpoint.check(saved, **run)
+            start = int(saved['k'])
+            self._restore(f, saved)
+        else:
+            start = 0
+            yield tout[0], y0.reshape(self.shape)
+
+        for k in range(start+1, len(tout)):
+            if checkpoint is not None and k-1 > start and checkpoint.due():
+                state = self._state(f, k-1, np.searchsorted(breaks, f.t, side='right'))
+                state.update(run)
+                checkpoint.save(state, results(k) if results is not None else None)
+            t0 = time.perf_counter()
+            self._to(f, tout[k], breaks, trace)
+            wall += time.perf_counter()-t0
+            self.stats = instrument.report(f._integrator, self.profile, wall)
+            yield f.t, f.y[J.iperm].reshape(self.shape)
+
+    def _integrator(self, y0, t0, rtol, atol):
+        # VODE BDF integrator of the node-major state from the flat
+        # field-major y0 at t0, with atol node-major
+        import scipy.integrate                  # slow to import, not needed until a solve
+        J = self.J
+        f = scipy.integrate.ode(self.pde_node, self.jac_node).set_integrator(
+            'vode', method='bdf', order=15, atol=atol, rtol=rtol,
+            nsteps=100000, with_jacobian=True, lband=J.lband, uband=J.uband)
+        f.set_initial_value(y0[J.perm], t0)
+        self._programme = self.programme()
+        return f
+
+    def _to(self, f, t, breaks, trace=None):
+        # Integrate f to the output time t. Breakpoints before t are output
+        # times of their own, and VODE integrates to t without passing the
+        # next breakpoint.
+        for tb in breaks[(breaks > f.t) & (breaks < t)]:
+            self._advance(f, tb, tb, trace)
+        later = breaks[breaks >= t]
+        self._advance(f, t, later[0] if len(later) else None, trace)
+
+    def _state(self, f, k, segment):
+        # Complete integrator state after output step k, for a checkpoint
+        vode = f._integrator
+        return dict(k=k, t=f.t, y=np.array(f.y), rwork=np.array(vode.rwork),
+                    iwork=np.array(vode.iwork), state_doubles=np.array(vode.state_doubles),
+                    state_ints=np.array(vode.state_ints), istate=vode.call_args[3],
+                    segment=segment)
+
+    def _restore(self, f, saved):
+        # Put f into the state of a checkpoint, as if it had integrated to it
+        vode = f._integrator
+        f.set_initial_value(saved['y'], float(saved['t']))
+        for name in ('rwork', 'iwork', 'state_doubles', 'state_ints'):
+            getattr(vode, name)[...] = saved[name]
+        vode.call_args[3] = int(saved['istate'])
+        self.stats = instrument.report(vode, self.profile, 0.0)
+
+    def _advance(self, f, t, tcrit, trace=None):
+        # Integrate f to t, not passing tcrit (VODE itask 4) unless None.
+        # With a trace, f first takes single steps (itask 5 or 2) up to t and
+        # then only interpolates onto it, which are the same steps.
+        vode = f._integrator
+        if tcrit is not None:
+            vode.rwork[0] = tcrit
+        while trace is not None and vode.rwork[12] < t:         # TCUR, not the last output time
+            vode.call_args[2] = 2 if tcrit is None else 5
+            f.integrate(t)
+            if not f.successful():
+                raise RuntimeError('integration failed at t = %g' % f.t)
+            trace.step(f)
+        vode.call_args[2] = 1 if tcrit is None else 4
+        f.integrate(t)
+        if not f.successful():
+            raise RuntimeError('integration failed at t = %g' % f.t)
+
+    def solve(self, tout, y0=None, rtol=1E-5, atol=None, checkpoint=None, trace=None):
+        # All output states of steps() as one array (len(tout),)+self.shape;
+        # a checkpoint holds the states so far
+        Y = np.zeros((len(tout),)+self.shape)
+        done = checkpoint.results('Y') if checkpoint is not None else None
+        start = 0
+        if done is not None:
+            start = len(done['Y'])
+            Y[:start] = done['Y']
+        steps = self.steps(tout, y0, rtol, atol, checkpoint, lambda k: dict(Y=Y[:k]), trace)
+        for k, (t, y) in enumerate(steps, start):
+            Y[k] = y
+        return Y
+
+    def run(self, tout, path, y0=None, rtol=1E-5, atol=None, meta=None, checkpoint=None, trace=None):
+        # Stream the output states of steps() into the store at path and
+        # return the final state; see store.Writer. A run resumed from a
+        # checkpoint appends to the store as it was at the checkpoint.
+        done = checkpoint.results('chunks', 't', 'y') if checkpoint is not None else None
+        steps = self.steps(tout, y0, rtol, atol, checkpoint, lambda k: w.state(), trace)
+        t, y = next(steps)                      # checks a checkpoint before the store is touched
+        with store.Writer(path, self.lay, self.shape, meta=meta, resume=done) as w:
+            w.append(t, y)
+            for t, y in steps:
+                w.append(t, y)
+        return y
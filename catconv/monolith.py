@@ -0,0 +1,290 @@
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+
+from catconv import instrument
+from catconv.model import Model
+from catconv.parameters import Parameters
+from catconv.schedule import lightoff_programme
+
+# Full-length monolith as a chain of slices.
+#
+# The converter is cut into slices of length p.zl, each a Model on its own
+# axial grid at its distance z0 from the entrance. At every cut the slices
+# see each other through the ghost nodes of their stencils: the gas,
+# washcoat and cordierite leaving slice i enter slice i+1, and axial
+# dispersion and conduction reach back from slice i+1 into slice i. Both directions matter,
+# a chain coupled downstream only is off by tens of percent in conversion
+# during light-off. The first slice takes the entering conditions of the
+# run; the other channels of the run's schedule (YO2, vmean, Mflow) apply to
+# every slice.
+#
+# The chain is solved by windowed waveform relaxation. The run is cut into
+# windows of output steps, and each window is iterated to convergence before
+# the next one starts. A sweep integrates every slice over the window from
+# its state at the window start, given the boundary waveforms of its
+# neighbours, sampled at the output times and interpolated linearly between
+# them: the upstream waveforms come from the same sweep, the downstream ones
+# from the previous sweep (held at their values at the window start in the
+# first). Sweeps repeat until the waveforms passed upstream change by less
+# than tol relative to the entering values. Short windows converge in a few
+# sweeps where whole-run sweeps need dozens through light-off.
+#
+# Each slice integration of a window is a task of its own. The task of slice
+# i in sweep s can run as soon as slice i-1 has finished sweep s and slice
+# i+1 sweep s-1, so sweeps run as a wavefront down the chain and with enough
+# processes sweep s+1 of the upstream slices overlaps sweep s downstream.
+# Tasks start from the complete solver state the slice reached at the end of
+# the previous window (see Model._state()), so every task is a function of
+# its inputs alone and the result is the same, bit for bit, for any number
+# of processes. Tasks of a sweep that turns out not to be needed are
+# discarded.
+#
+# The Jacobian of a slice is that of a stand-alone channel, so the coupling
+# through the ghost nodes is left to the relaxation. Converged, the chain
+# differs from one model of the whole length (reference()) only by the time
+# sampling of the waveforms; compare() measures the difference at the exit.
+#
+#   mono = Monolith(20)
+#   Ys = mono.solve(tout)                  # (len(tout), n) per slice
+#   mono.outlet(tout, Ys)['COconv']        # (len(tout), 20)
+
+
+class Waveform(object):
+    # Values at the times t, interpolated linearly in between
+
+    def __init__(self, t, values):
+        self.t = t
+        self.values = values
+        self.value = np.zeros(values.shape[1:])
+
+    def __call__(self, t):
+        t0 = self.t
+        k = min(max(np.searchsorted(t0, t, side='right')-1, 0), len(t0)-2)
+        a = (t-t0[k])/(t0[k+1]-t0[k])
+        np.multiply(self.values[k+1], a, out=self.value)
+        self.value += (1-a)*self.values[k]
+        return self.value
+
+
+class Slice(Model):
+
+    def __init__(self, mono, i):
+        # Slice i of the monolith mono. upstream and downstream are the
+        # (gas, washcoat[, cordierite]) Waveforms at the last node of slice
+        # i-1 and at the first node of slice i+1, None at the ends of the
+        # chain.
+        Model.__init__(self, mono.p, mono.nz, mono.ns, mono.nu, schedule=mono.schedule,
+                       z0=i*mono.p.zl)
+        self.i = i
+        self.upstream = None
+        self.downstream = None
+
+    def entering(self, t):
+        Yge = Model.entering(self, t)
+        if self.upstream is not None:
+            Yge[...] = self.upstream[0](t)
+        return Yge
+
+    def neighbours(self, t):
+        up = _sample(self.upstream, t)
+        down = _sample(self.downstream, t)
+        return down[0], up[1], down[1], up[2], down[2]
+
+
+class Monolith(object):
+
+    def __init__(self, slices, p=None, nz=5, ns=5, nu=3, schedule=None):
+        # slices   - number of slices of length p.zl
+        # schedule - schedule.Schedule of the gas entering the converter,
+        #            the light-off programme from p.Tke by default
+        if p is None:
+            p = Parameters()
+        if slices < 1:
+            raise ValueError('a monolith needs at least one slice')
+        self.slices = slices
+        self.p = p
+        self.nz = nz
+        self.ns = ns
+        self.nu = nu
+        self.schedule = schedule if schedule is not None else lightoff_programme(p.Tke)
+        self.lay = Model(p, nz, ns, nu).lay
+        self.stats = {}
+
+    def solve(self, tout, rtol=1E-5, tol=1E-4, max_sweeps=20, window=10, processes=None):
+        # States of every slice at the output times, a list of
+        # (len(tout), n) arrays from the entrance to the exit. window is the
+        # number of output steps relaxed at a time; processes the number of
+        # slice tasks run at once, one per core by default, 1 runs them one
+        # after the other in this process. stats holds the sweeps and the
+        # change of the waveforms per window, the number of tasks run and
+        # discarded, and the solver report of every slice at the end.
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = max(1, min(processes, self.slices))
+        tout = np.asarray(tout, dtype=float)
+        nt = len(tout)
+        Ys = [np.zeros((nt, self.lay.n)) for i in range(self.slices)]
+        y0 = Model(self.p, self.nz, self.ns, self.nu).initial().ravel()
+        for Y in Ys:
+            Y[0] = y0
+        states = [None]*self.slices
+        self.stats = dict(windows=0, sweeps=[], change=[], tasks=0, discarded=0, slices=None)
+        stops = np.union1d(np.arange(0, nt, window), [nt-1])
+        pool = multiprocessing.Pool(processes) if processes > 1 else None
+        try:
+            for a, b in zip(stops[:-1], stops[1:]):
+                done = self._window(tout, rtol, tol, max_sweeps, a, b, Ys, states, pool, processes)
+                for i, (Y, state, first, last, stats) in enumerate(done):
+                    Ys[i][a+1:b+1] = Y
+                    states[i] = state
+                self.stats['windows'] += 1
+                self.stats['slices'] = [r[4] for r in done]
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return Ys
+
+    def _window(self, tout, rtol, tol, max_sweeps, a, b, Ys, states, pool, processes):
+        # Relax the outputs a+1..b of all slices to convergence; the results
+        # of the accepted sweep per slice, see _task()
+        N = self.slices
+        scale = np.array([max(self.p.Yae, self.p.Ybe, self.p.Yce)]*3+[self.p.Tke])
+        scales = (scale, scale[:,None], self.p.Tke)     # gas, washcoat, cordierite
+        held = [None]+[tuple(np.repeat(e[None], b-a+1, axis=0) for e in _ends(self.lay, Y[a], 0))
+                       for Y in Ys[1:]]
+        results = {}
+        launched = set()
+        finished = queue.Queue()
+        running = 0
+        changes = []
+        sweep = 0                               # lowest sweep not yet complete
+        while True:
+            # start the tasks whose inputs are known, at most one sweep ahead
+            ready = sorted((s, i) for s in (sweep, sweep+1) if s < max_sweeps for i in range(N)
+                           if (i, s) not in launched
+                           and (i == 0 or (i-1, s) in results)
+                           and (s == 0 or i == N-1 or (i+1, s-1) in results))
+            for s, i in ready[:processes-running]:
+                upstream = results[i-1, s][3] if i > 0 else None
+                if i == N-1:
+                    downstream = None
+                elif s == 0:
+                    downstream = held[i+1]
+                else:
+                    downstream = results[i+1, s-1][2]
+                args = (self, i, tout, rtol, a, b, states[i], upstream, downstream)
+                launched.add((i, s))
+                running += 1
+                self.stats['tasks'] += 1
+                if pool is None:
+                    finished.put(((i, s), _task(*args)))
+                else:
+                    pool.apply_async(_task, args,
+                                     callback=lambda r, key=(i, s): finished.put((key, r)),
+                                     error_callback=lambda e, key=(i, s): finished.put((key, e)))
+            key, r = finished.get()
+            running -= 1
+            if isinstance(r, Exception):
+                raise r
+            results[key] = r
+            # a complete sweep: accept it if the waveforms passed upstream
+            # have settled
+            while all((i, sweep) in results for i in range(N)):
+                change = 0.0 if N == 1 else np.inf
+                if sweep > 0:
+                    change = max((np.abs(e1-e0)/c).max() for i in range(1, N)
+                                 for e1, e0, c in zip(results[i, sweep][2], results[i, sweep-1][2], scales))
+                changes.append(change)
+                if change <= tol:
+                    # tasks of the next sweep still running are discarded
+                    self.stats['discarded'] += len(launched)-N*(sweep+1)
+                    self.stats['sweeps'].append(sweep+1)
+                    self.stats['change'].append(changes)
+                    return [results[i, sweep] for i in range(N)]
+                sweep += 1
+                if sweep == max_sweeps:
+                    raise RuntimeError('waveform relaxation did not converge in %d sweeps over '
+                                       't = %g..%g s (change %g)' % (max_sweeps, tout[a], tout[b], change))
+
+    def outlet(self, tout, Ys):
+        # Conversions and gas temperature at the exit of every slice, each
+        # (len(tout), slices)
+        Yae, Yce = self._entering(tout)
+        Ya, Yb, Yc, Tk = np.moveaxis(np.array([self.lay.gas(Y)[...,-1] for Y in Ys]), -1, 0)
+        return dict(COconv=(Yae[:,None]-Ya.T)/Yae[:,None], HCconv=(Yce[:,None]-Yc.T)/Yce[:,None],
+                    Tk=Tk.T)
+
+    def _entering(self, tout):
+        values = [self.schedule(t) for t in tout]
+        return (np.array([v.get('Yae', self.p.Yae) for v in values]),
+                np.array([v.get('Yce', self.p.Yce) for v in values]))
+
+    def reference(self):
+        # One model of the whole length with the same axial grid spacing
+        overrides = dict((name, value) for name, value in vars(self.p).items()
+                         if name in vars(Parameters))
+        overrides['zl'] = self.slices*self.p.zl
+        return Model(Parameters(**overrides), self.slices*self.nz, self.ns, self.nu,
+                     schedule=self.schedule)
+
+    def compare(self, tout, Ys, rtol=1E-5):
+        # Largest deviations of the exit conversions and gas temperature of
+        # the chain Ys from the one-piece reference
+        m = self.reference()
+        Ya, Yb, Yc, Tk = m.lay.gas(m.solve(tout, rtol=rtol))[...,-1].T
+        Yae, Yce = self._entering(tout)
+        exit = self.outlet(tout, Ys)
+        return dict(COconv=np.max(np.abs(exit['COconv'][:,-1]-(Yae-Ya)/Yae)),
+                    HCconv=np.max(np.abs(exit['HCconv'][:,-1]-(Yce-Yc)/Yce)),
+                    Tk=np.max(np.abs(exit['Tk'][:,-1]-Tk)))
+
+
+def _ends(lay, Y, end):
+    # Gas, washcoat and, when the layout has it, cordierite at the first
+    # (end=0) or last (end=-1) node of the states Y, as passed across a cut
+    ends = (np.array(lay.gas(Y)[...,end]), np.array(lay.washcoat(Y)[...,end,:]))
+    if lay.nu > 0:
+        ends += (np.array(lay.cordierite(Y)[...,0,end,:]),)
+    return ends
+
+
+def _sample(waveforms, t):
+    # (gas, washcoat, cordierite) values of the waveforms at t, None for
+    # those missing
+    values = [w(t) for w in waveforms] if waveforms is not None else []
+    return values+[None]*(3-len(values))
+
+
+def _task(mono, i, tout, rtol, a, b, state, upstream, downstream):
+    # Integrate slice i over the outputs a+1..b from its solver state at
+    # tout[a] (None at the start of the run) with the given neighbour
+    # waveforms over a..b. Returns the outputs, the solver state at tout[b],
+    # the (gas, washcoat) waveforms at its first and last node over a..b and
+    # the solver report.
+    m = Slice(mono, i)
+    t = tout[a:b+1]
+    if upstream is not None:
+        m.upstream = tuple(Waveform(t, values) for values in upstream)
+    if downstream is not None:
+        m.downstream = tuple(Waveform(t, values) for values in downstream)
+    J = m.J
+    y0 = m.initial().ravel()
+    atol = np.broadcast_to(m.tolerances(), m.shape).ravel()[J.perm]
+    f = m._integrator(y0, t[0], rtol, atol)
+    if state is not None:
+        m._restore(f, state)
+    breaks = np.union1d(m.breakpoints(), t[-1:])
+    Y = np.zeros((len(t), m.lay.n))
+    Y[0] = f.y[J.iperm]
+    m.profile.reset()
+    t0 = time.perf_counter()
+    for k in range(1, len(t)):
+        m._to(f, t[k], breaks)
+        Y[k] = f.y[J.iperm]
+    stats = instrument.report(f._integrator, m.profile, time.perf_counter()-t0)
+    segment = np.searchsorted(breaks, f.t, side='right')
+    return Y[1:], m._state(f, b, segment), _ends(m.lay, Y, 0), _ends(m.lay, Y, -1), stats
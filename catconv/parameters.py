@@ -0,0 +1,102 @@
+import math
+
+# Operating conditions, geometry, catalyst and kinetic data of the monolith
+# slice. The class attributes are the defaults of the light-off experiment;
+# any of them can be overridden by keyword, e.g. Parameters(vmean=3.0,
+# LPt=1.5E-6). Derived quantities are recomputed from the final values.
+
+
+class Parameters(object):
+
+    #Operating and inlet conditions
+    Ya0 = 3000/1E6    #Initial CO mol fraction               #ppm
+    Yae = 3000/1E6    #Entering CO mol fraction              #ppm
+    Yb0 = 0.0         #Initial CO2 mol fraction              #ppm
+    Ybe = 0.0         #Entering CO2 mol fraction             #ppm
+    Yc0 = 500/1E6     #Initial C3H8 mol fraction             #ppm
+    Yce = 500/1E6     #Entering C3H8 mol fraction            #ppm
+    Tk0 = 417         #Initial temperature                   #K
+    Tke = 417         #Entering temperature                  #K
+    R = 8.314         #Gas constant                          #m^3.Pa/(K.mol)
+    P = 101325        #Pressure                              #Pa
+    vmean = 2.4       #Linear mean fluid velocity            #m/s
+    Mflow = 0.64      #Average moar flowrate of fuel and air #mol/s
+
+    #Information of dimension and active sites
+    r0 = 5.45E-4      #Channel radius                                        #m
+    s0 = 20E-6        #Washcat thickness                                     #m
+    s_ratio = 1.0     #Grading of the washcoat grid, last/first radial spacing
+    u0 = 90E-6        #Cordierite thickness                                  #m
+    dm = 0.106        #Diameter of monolith block                            #m
+    w_slice = 27.6316 #Weight of a monolith slice based on 630g per monolith #g
+    cpsi = 400        #Cells per square inch
+
+    #Details of porous media (Assume parallel pore)
+    re = 13.3E-9      #Equivalent pore radius   #m
+    por = 0.5         #Porosity                #m^3 gas/m^3
+    tau = 4           #Tortuosity
+
+    #Active sites per catalyst/washcoat
+    LPt = 2.0E-6      #Pt loading data from CO chemisorption on wc and cord  #mol(Pt)/g(cat)
+    aBET = 100        #BET surface from ASAP and autopore)                   #m2 (cat)/g(cat)
+    rho_wc = 1.3E6    #Loose buk density                                     #g/m3
+    rho_cord = 2.5E6  #Density of substrate                                  #g/m3
+    k_cord = 1.5      #Thermal conductivity of substrate                     #W/(m.K)
+    LPtc = 0.005468   #Data from weighing                                    #g(Pt)/g(cat)
+
+    #Common information of catalyst
+    zl = 0.005        #Channel length of 5mm thin slice                                #m
+    Avo = 6.022E23    #Avogadro number                                                 #mol^-1
+    MPt = 195.08      #Molar mass of Pt                                                #g(Pt)/mol(Pt)
+    a_m = 8.07E-20    #Surface area occupied by a Pt atom on a polycrystalline surface #m2
+
+    #Kinetic parameters for LHHW
+    pf = 0.729e21
+    pg = 965.5
+    pt = 4.042e15
+    pv = 2080.0
+    pw = 3.98
+    act1 = -12556.0
+    act2 = 961.0
+    act3 = -1.08e4
+    act4 = 361.0
+    act5 = 11611.0
+
+    #Other parameters
+    YO2 = 0.0933
+    DH = 1.09E-3
+    ff = 1.0
+
+    def __init__(self, **kw):
+        for name, value in kw.items():
+            if not isinstance(vars(Parameters).get(name), (int, float)):
+                raise TypeError('unknown parameter %r' % name)
+            setattr(self, name, value)
+
+        self.cpsm = self.cpsi/0.000645             #Cells / m^2
+        self.Amon = math.pi*(self.dm/2)**2         #Cross sectional area of monolith slice    #m2
+        self.ncell = self.cpsm*self.Amon           #Number of cells
+        self.V_slice = self.Amon*self.zl           #Volume of a slice includeing voidage      #m^3
+        self.H = self.LPt/self.aBET                #Assume uniform active sites density       #mol(Pt) m^-2(cat)
+        self.Av = self.aBET*self.rho_wc            #Internal Surface area per reactor vol     #m2(cat) m^-3(cat)
+        self.r_gtc = self.por/(1-self.por)         #Ratio of voue of gas to solid             #m^3(gas) m ^-3(cat)
+        self.N_atom = self.LPtc*self.Avo/self.MPt  #No. of Pt atoms as deposited
+        self.Ns_atom = self.LPt*self.Avo           #No. of Pt surface atoms
+        self.D = self.Ns_atom/self.N_atom
+        self.Ssp = self.a_m*self.Avo*self.D/self.MPt
+        self.G = 1/(self.Ssp*self.MPt)
+
+    def values(self):
+        # Effective values of all parameters, overridden or not
+        return dict((name, getattr(self, name)) for name, value in vars(Parameters).items()
+                    if isinstance(value, (int, float)))
+
+    @property
+    def pre(self):
+        # Pre-exponential factors of k1 .. k5
+        return [self.pf, self.pg, self.pt, self.pv, self.pw]
+
+    @property
+    def act(self):
+        # Activation temperatures of k1 .. k5
+        return [self.act1, self.act2, self.act3, self.act4, self.act5]
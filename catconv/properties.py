@@ -0,0 +1,236 @@
+import numpy as np
+
+from catconv.mechanism import lhhw
+from catconv.stencils import washcoat_grid
+
+# Physical properties and kinetics of the transient monolith model, evaluated
+# from the current state on whole arrays.
+#
+# update() is called by pde on every right-hand side evaluation, so the
+# transport coefficients and the reaction rates always belong to the state the
+# solver is asking about. Results are written into buffers allocated once;
+# species quantities are stacked in field order (CO, CO2, C3H8) and, where the
+# model needs it, the heat equation is stacked behind them as a fourth row.
+# The familiar names (Dca, Dia, kma, Deas, Ds, ...) are views of the stacked
+# buffers. Every property has storage of its own: in the original loop script
+# the chained assignments (v = Dca = ... = Dia = np.zeros(nz), and so on) made
+# each group one shared array, so a node's later writes overwrote its earlier
+# ones and pde read the last value for all of them; the results differ from
+# that script accordingly. The reactions come from a mechanism.Mechanism over
+# the three species, the LHHW CO/C3H8 mechanism by default. Any leading batch
+# axes of the state (lead) are kept in front of the field axis, as in the
+# stencils. Everything returned is overwritten by the next call.
+
+# Molar masses (g/mol) and diffusion volumes of CO, CO2 and C3H8, and of air
+M = np.array([28.01, 44.01, 44.1])
+V = np.array([18.9, 22.262, 65.34])
+Mair = 28.96
+Vair = 20.1
+
+Pr = 0.7            # Prandtl number of the exhaust gas
+SPECIES = ('CO', 'CO2', 'C3H8')
+
+
+class Properties(object):
+
+    def __init__(self, nz, ns, dz, p, lead=(), mechanism=None, z0=0.0, nu=0):
+        # p         - Parameters of the slice
+        # z0        - distance of the slice from the channel entrance, m
+        # nu        - radial cordierite nodes, 0 without the substrate
+        # mechanism - mechanism.Mechanism, mechanism.lhhw(p) by default
+        lead = tuple(lead)
+        self.nz = nz
+        self.ns = ns
+        self.lead = lead
+        self.P = p.P
+        self.R = p.R
+        self.vmean = p.vmean
+        self.r0 = p.r0
+        self.DH = p.DH
+        self.mech = mechanism or lhhw(p)
+        if self.mech.species != SPECIES:
+            raise ValueError('the mechanism must have the state species %s' % ', '.join(SPECIES))
+        for name in self.mech.fixed_names:
+            # fixed mole fractions YO2, ..., set by the model's schedule
+            setattr(self, 'Y'+name, getattr(p, 'Y'+name, self.mech.fixed[name]))
+
+        # Constant factors of the correlations
+        self.cD = (1.013E-2*(1/M+1/Mair)**0.5/(p.P*(V**0.3333+Vair**0.3333)**2)).reshape(3,1)
+        self.cDs = self.cD.reshape(3,1,1)
+        self.cK = (97.0*p.re/M**0.5).reshape(3,1,1)
+        self.cE = p.ff*p.por/p.tau
+        L = z0+dz*np.arange(1,nz+1)             # distance from the channel entrance
+        self.cGz = p.DH*Pr*p.DH/L                # Graetz number per vmean*rho/miu
+        self.rho_s = p.rho_wc/1000
+        self.cR = p.H*p.Av/p.r_gtc*p.R/p.P
+        self.cQ = p.H*p.Av/self.rho_s
+        self.rho_u = p.rho_cord/1000
+        self.k_u = p.k_cord
+        s = washcoat_grid(p.s0, ns, p.s_ratio)
+        self.hw = s[-1]-s[-2]                   # last washcoat spacing, at the wall
+        self.du = p.u0/nu if nu > 0 else 0.0
+
+        # Gas, lead+(nz,) per property
+        self.v = np.zeros(lead+(nz,))
+        self.Dm = np.zeros(lead+(4,nz))         # molecular and thermal diffusivities
+        self.Dca, self.Dcb, self.Dcc, self.Dt = fields(self.Dm, 1)
+        self.Dig = np.zeros(lead+(4,nz))        # axial dispersion
+        self.Dia, self.Dib, self.Dic, self.Dit = fields(self.Dig, 1)
+        self.k_a = np.zeros(lead+(nz,))
+        self.rho_a = np.zeros(lead+(nz,))
+        self.Cp_a = np.zeros(lead+(nz,))
+        self.Nu = np.zeros(lead+(nz,))
+        self.hm = np.zeros(lead+(nz,))
+        self.kg = np.zeros(lead+(4,nz))         # gas side transfer, kma .. kmc, hm/(rho_a*Cp_a)
+        self.kma, self.kmb, self.kmc, _ = fields(self.kg, 1)
+        self.ks = np.zeros(lead+(4,nz))         # washcoat side transfer, kma .. kmc, hm/(rho_s*Cp_s)
+
+        # Washcoat, lead+(nz,ns) per property
+        self.Dcs = np.zeros(lead+(3,nz,ns))
+        self.Dks = np.zeros(lead+(3,nz,ns))
+        self.Des = np.zeros(lead+(4,nz,ns))     # effective diffusivities
+        self.Deas, self.Debs, self.Decs, self.Ds = fields(self.Des, 2)
+        self.Cp_s = np.zeros(lead+(nz,ns))
+        self.r = np.zeros(lead+(self.mech.nr,nz,ns))   # reaction rates
+        self.src = np.zeros(lead+(4,nz,ns))     # reaction source terms of the washcoat balances
+        self.dsrc = np.zeros(lead+(4,4,nz,ns))  # d(src_k)/d(field_l)
+
+        # Cordierite, lead+(nz,nu), and its interface with the washcoat wall
+        # node, lead+(nz,)
+        self.Cp_u = np.zeros(lead+(nz,nu))
+        self.Du = np.zeros(lead+(nz,nu))        # thermal diffusivity
+        self.fw = np.zeros(lead+(nz,))          # washcoat share of the interface node
+        self.kw = np.zeros(lead+(nz,))          # cordierite conductance into it
+
+    def gas(self, Tk):
+        # Velocity, dispersion and film transfer coefficients along the channel
+        Dm = self.Dm
+        np.multiply(Tk, self.vmean/298, out=self.v)
+        np.multiply(self.cD, (Tk**1.75)[...,None,:], out=Dm[...,:3,:])
+        self.k_a[...] = 1.679E-2+5.073E-5*Tk
+        np.divide(self.P*Mair/(1000*self.R), Tk, out=self.rho_a)
+        self.Cp_a[...] = (28.09+Tk*(1.965E-3+Tk*(4.799E-6-1.965E-9*Tk)))/(Mair/1000)
+        np.divide(self.k_a, self.rho_a*self.Cp_a, out=self.Dt)
+
+        # Taylor dispersion, Di = D + (v*r0)**2/(48*D)
+        np.divide(((self.v*self.r0)**2/48.0)[...,None,:], Dm, out=self.Dig)
+        np.add(self.Dig, Dm, out=self.Dig)
+
+        # Developing-flow Nusselt number from the Graetz number, Sh = Nu
+        miu = 7.701E-6+Tk*(4.166E-8-7.531E-12*Tk)
+        Gz = self.rho_a/miu*(self.vmean*self.cGz)
+        NuT = 3.657+8.827*(1000/Gz)**-0.545*np.exp(-48.2/Gz)
+        NuH = 4.367+13.18*(1000/Gz)**-0.524*np.exp(-60.2/Gz)
+        np.multiply(NuT+NuH, 0.5, out=self.Nu)
+        np.add(self.Nu, 2.0, out=self.Nu)
+
+        # kma .. kmc = Sh*Dc/DH, and hm/(rho_a*Cp_a) = Nu*Dt/DH
+        np.multiply(Dm, (self.Nu/self.DH)[...,None,:], out=self.kg)
+        np.multiply(self.Nu, self.k_a/self.DH, out=self.hm)
+
+    def washcoat(self, Tks):
+        # Effective diffusivities (bulk and Knudsen in series) and conductivity
+        Dcs, Dks = self.Dcs, self.Dks
+        np.multiply(self.cDs, (Tks**1.75)[...,None,:,:], out=Dcs)
+        np.multiply(self.cK, np.sqrt(Tks)[...,None,:,:], out=Dks)
+        De = self.Des[...,:3,:,:]
+        np.multiply(Dcs, Dks, out=De)
+        np.divide(De, Dcs+Dks, out=De)
+        np.multiply(De, self.cE, out=De)
+
+        np.multiply(Tks, 0.2268, out=self.Cp_s)
+        np.add(self.Cp_s, 948, out=self.Cp_s)
+        np.divide(0.9558-2.09E-4*Tks, self.rho_s*self.Cp_s, out=self.Ds)
+
+    def kinetics(self, Tks, Ys):
+        # Reaction rates of the mechanism and the resulting sources, after
+        # washcoat() has been evaluated at the same Tks; Ys holds the species
+        # fields lead+(3,nz,ns)
+        mech, cells = self.mech, (self.nz*self.ns,)
+        T = Tks.reshape(self.lead+cells)
+        fixed = [getattr(self, 'Y'+name) for name in mech.fixed_names]
+        r, prod, q = mech.sources(T, Ys.reshape(self.lead+(3,)+cells), fixed, self.R/self.P)
+        self.r[...] = r.reshape(self.r.shape)
+
+        # Species sources cR*T*prod, heat source -cQ*q/Cp_s
+        src = self.src.reshape(self.lead+(4,)+cells)
+        cT = self.cR*T
+        np.multiply(prod, cT[...,None,:], out=src[...,:3,:])
+        Cp = self.Cp_s.reshape(self.lead+cells)
+        np.divide(q, Cp, out=src[...,3,:])
+        src[...,3,:] *= -self.cQ
+        self._state = (T, cT, prod, Cp)
+
+    def cell_sources(self, T, Ys, mech=None, derivatives=True):
+        # Sources of the washcoat balances (4, c) and, with derivatives,
+        # their derivatives (4, 4, c) with respect to YCO, YCO2, YHC and Tks
+        # at any c cells, T (c,) and Ys (3, c): the same as kinetics() and
+        # dsources() without the grid buffers. mech is a copy of the
+        # mechanism for concurrent callers, since a mechanism keeps its last
+        # point.
+        mech = mech or self.mech
+        fixed = [getattr(self, 'Y'+name) for name in mech.fixed_names]
+        r, prod, q = mech.sources(T, Ys, fixed, self.R/self.P)
+        Cp = 948+0.2268*T
+        cT = self.cR*T
+        qf = -self.cQ/Cp
+        src = np.empty((4,)+T.shape)
+        src[:3] = prod*cT
+        src[3] = q*qf
+        if not derivatives:
+            return src
+        pY, pT, qY, qT = mech.dsources()
+        dsrc = np.empty((4,4)+T.shape)
+        dsrc[:3,:3] = pY*cT
+        dsrc[:3,3] = pT*cT+self.cR*prod
+        dsrc[3,:3] = qY*qf
+        dsrc[3,3] = qT*qf-src[3]*0.2268/Cp
+        return src, dsrc
+
+    def cordierite(self, Tku, Tw):
+        # Thermal diffusivity of the substrate, and the interface node at the
+        # washcoat wall temperature Tw, which holds half a washcoat cell and
+        # half a cordierite cell:
+        #   dTw/dt = fw*(washcoat balance) + kw*(Tku[...,0]-Tw)
+        np.multiply(Tku, 0.156, out=self.Cp_u)
+        self.Cp_u += 1071-3.435E7/Tku**2
+        np.divide(self.k_u/self.rho_u, self.Cp_u, out=self.Du)
+        a = self.rho_s*self.Cp_s[...,-1]*(self.hw/2)
+        c = self.rho_u*(1071+0.156*Tw-3.435E7/Tw**2)*(self.du/2)
+        np.divide(a, a+c, out=self.fw)
+        np.divide(self.k_u/self.du, a+c, out=self.kw)
+
+    def update(self, Yg, Ysw, Tku=None):
+        # All properties for the stacked gas lead+(4,nz) and washcoat
+        # lead+(4,nz,ns) fields of pde, and the cordierite lead+(nz,nu) when
+        # the model has one
+        Tks = Ysw[...,3,:,:]
+        self.gas(Yg[...,3,:])
+        self.washcoat(Tks)
+        self.kinetics(Tks, Ysw[...,:3,:,:])
+        self.ks[...,:3,:] = self.kg[...,:3,:]
+        np.divide(self.hm, self.rho_s*self.Cp_s[...,0], out=self.ks[...,3,:])
+        if Tku is not None:
+            self.cordierite(Tku, Tks[...,-1])
+
+    def dsources(self):
+        # Derivatives of the reaction sources with respect to YCO, YCO2, YHC
+        # and Tks in each cell, at the state of the last kinetics() call
+        cells = (self.nz*self.ns,)
+        T, cT, prod, Cp = self._state
+        pY, pT, qY, qT = self.mech.dsources()
+        ds = self.dsrc.reshape(self.lead+(4,4)+cells)
+        np.multiply(pY, cT[...,None,None,:], out=ds[...,:3,:3,:])
+        np.multiply(pT, cT[...,None,:], out=ds[...,:3,3,:])
+        ds[...,:3,3,:] += self.cR*prod
+        qf = -self.cQ/Cp
+        np.multiply(qY, qf[...,None,:], out=ds[...,3,:3,:])
+        np.multiply(qT, qf, out=ds[...,3,3,:])
+        ds[...,3,3,:] -= self.src.reshape(self.lead+(4,)+cells)[...,3,:]*0.2268/Cp
+        return self.dsrc
+
+
+def fields(a, ndim):
+    # Views of the field rows of a stacked buffer lead+(nf,)+grid, where
+    # the grid has ndim axes
+    return list(np.moveaxis(a, -ndim-1, 0))
@@ -0,0 +1,183 @@
+import time
+
+import numpy as np
+
+from catconv.model import Model
+from catconv.schedule import CHANNELS
+
+# Fixed-step stepping of the model for real-time use, e.g. alongside an
+# engine simulator at 10-100 Hz.
+#
+# A Realtime holds the state and advances it on request,
+#
+#   rt = Realtime(Model(p), h=0.01)
+#   outlet = rt.step(0.01, dict(Tke=620.0, Yae=2.5E-3, Mflow=0.7))
+#   outlet[3]                              # outlet gas temperature
+#
+# with the entering conditions of the step as a dict of any schedule
+# channels (schedule.CHANNELS); channels not given keep their last value.
+# The outlet is a view (Ya, Yb, Yc, Tk) into the state, overwritten by the
+# next step.
+#
+# The integrator is the linearly implicit Euler method, a one-stage
+# Rosenbrock (W-)method,
+#
+#   (I - h*J) k = f(t, y),   y <- y + h*k,
+#
+# first order, L-stable and exact at steady states whatever J is, so the
+# factored matrix is reused across steps and refreshed every refresh steps
+# from the Jacobian at the state of that step. A step costs one right-hand
+# side and one banded back substitution; a refreshing step adds the
+# Jacobian (with the properties of the step's right-hand side) and one
+# banded LU. The solver works in the node-major ordering of
+# jacobian.Jacobian with LAPACK's band routines, and all buffers, the band
+# matrix included, are allocated once: the stepping itself allocates
+# nothing, only the model's property evaluation keeps some small
+# temporaries.
+#
+# step(dt) takes round(dt/h) substeps of equal length; a dt that is not a
+# multiple of h refactors the matrix for the new substep. The wall time of
+# every step is kept, latency() gives its percentiles.
+#
+# The entering conditions are the stepper's own: the model's schedule is
+# left alone and the model can still solve() on it between steps.
+
+
+class _Inlet(object):
+    # Constant entering conditions for Model.entering, set by the caller
+
+    breakpoints = np.zeros(0)
+
+    def __init__(self):
+        self.values = {}
+
+    def __call__(self, t):
+        return self.values
+
+
+class Realtime(object):
+
+    def __init__(self, model=None, h=0.01, y0=None, refresh=10, capacity=100000):
+        # model    - model.Model without batch axes, Model() by default
+        # h        - substep, s
+        # y0       - initial state, model.initial() by default
+        # refresh  - steps between Jacobian refreshes, 0 keeps the first
+        # capacity - number of step latencies kept
+        from scipy.linalg import lapack         # slow to import, as scipy.integrate in Model
+        if model is None:
+            model = Model()
+        if model.lead:
+            raise ValueError('real-time stepping needs a model without batch axes')
+        self.m = model
+        self.h = h
+        self.refresh = refresh
+        self._dgbtrf = lapack.dgbtrf
+        self._dgbtrs = lapack.dgbtrs
+        m = model
+        J = m.J
+        self.kl, self.ku = J.lband, J.uband
+        n = self.n = m.lay.n
+
+        # Entering conditions start from the parameters
+        self.inlet = _Inlet()
+        self.inlet.values.update((name, float(getattr(m.p, name))) for name in CHANNELS)
+
+        # State in the solver ordering (z) and field-major (y)
+        self.t = 0.0
+        self.y = np.array(m.initial() if y0 is None else y0, dtype=float).reshape(n)
+        self.z = self.y[J.perm]
+        self.k = np.zeros(n)
+        self.outlet = m.lay.gas(self.y)[:,-1]
+
+        # Band matrix I - h*J in LAPACK's layout, kl extra rows for the
+        # factorisation, factored in place
+        self.ab = np.zeros((2*self.kl+self.ku+1, n), order='F')
+        self.piv = None
+        self._h = None                          # substep of the factored matrix
+        self.age = 0                            # steps since the last refresh
+
+        self.latencies = np.zeros(capacity)
+        self.steps = 0
+        self.refreshes = 0
+
+    def set_inlet(self, inlet):
+        # Entering conditions from now on, any of schedule.CHANNELS
+        for name in inlet:
+            if name not in self.inlet.values:
+                raise ValueError('unknown inlet channel %r' % name)
+        self.inlet.values.update(inlet)
+
+    def step(self, dt=None, inlet=None):
+        # Advance the state by dt (h by default) at the entering conditions
+        # inlet; returns the outlet view (Ya, Yb, Yc, Tk)
+        t0 = time.perf_counter()
+        if inlet:
+            self.set_inlet(inlet)
+        if dt is None:
+            dt = self.h
+        n = max(1, int(round(dt/self.h)))
+        h = dt/n
+        m = self.m
+        programme, m._programme = m._programme, self.inlet
+        try:
+            for i in range(n):
+                self._substep(h)
+        finally:
+            m._programme = programme
+        np.take(self.z, m.J.iperm, out=self.y)
+        self.latencies[self.steps % len(self.latencies)] = time.perf_counter()-t0
+        self.steps += 1
+        return self.outlet
+
+    def _substep(self, h):
+        m, J = self.m, self.m.J
+        np.take(self.z, J.iperm, out=self.y)
+        f = m.rhs(self.t, self.y).reshape(self.n)
+        if self.piv is None or h != self._h or (self.refresh and self.age >= self.refresh):
+            self._factor(h)
+        self.age += 1
+        np.take(f, J.perm, out=self.k)
+        k, info = self._dgbtrs(self.ab, self.kl, self.ku, self.k, self.piv, overwrite_b=1)
+        if info != 0:
+            raise RuntimeError('banded back substitution failed at t = %g (info %d)' % (self.t, info))
+        if k is not self.k:
+            self.k[...] = k
+        self.k *= h
+        self.z += self.k
+        self.t += h
+
+    def _factor(self, h):
+        # Factor I - h*J at the state of the last rhs() call
+        kl, ku, ab = self.kl, self.ku, self.ab
+        m = self.m
+        Jb = m.J.banded(*m.jac_values(self.y, self.t, update=False))
+        np.multiply(Jb, -h, out=ab[kl:])
+        ab[kl+ku] += 1.0
+        ab[:kl] = 0.0
+        lu, piv, info = self._dgbtrf(ab, kl, ku, overwrite_ab=1)
+        if info > 0:
+            self.piv = None
+            raise RuntimeError('I - h*J is singular at t = %g' % self.t)
+        if info < 0:
+            self.piv = None
+            raise RuntimeError('banded factorisation failed at t = %g (info %d)' % (self.t, info))
+        if lu is not ab:
+            ab[...] = lu
+        self.piv = piv
+        self._h = h
+        self.age = 0
+        self.refreshes += 1
+
+    def state(self):
+        # Copy of the current state, field-major
+        return self.y.copy()
+
+    def latency(self, percentiles=(50, 90, 99, 99.9)):
+        # Percentiles of the wall time per step, s, over the kept steps, and
+        # the largest
+        kept = self.latencies[:min(self.steps, len(self.latencies))]
+        out = dict(('p%g' % q, float(np.percentile(kept, q))) for q in percentiles)
+        out['max'] = float(kept.max())
+        out['steps'] = self.steps
+        out['refreshes'] = self.refreshes
+        return out
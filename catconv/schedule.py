@@ -0,0 +1,132 @@
+import hashlib
+
+import numpy as np
+
+# Time-dependent entering conditions.
+#
+# A Schedule is a set of named channels sampled at common breakpoint times and
+# interpolated linearly between them; before the first and after the last
+# breakpoint the end values hold. The model understands the channels
+#
+#   Tke, Yae, Ybe, Yce   entering temperature and mole fractions
+#   YO2                  oxygen mole fraction
+#   vmean                mean gas velocity, m/s
+#   Mflow                molar flow, mol/s, applied as vmean scaled by
+#                        Mflow/p.Mflow
+#
+# and takes any channel a schedule does not have from its Parameters.
+# Evaluation is one binary search over the breakpoints and one multiply-add
+# per channel, so long 1 Hz drive cycles cost no more per call than a short
+# ramp. The breakpoints are also where the slopes change, and the solver
+# stops on each of them rather than stepping across the kink.
+#
+# Schedules of measured cycles are read from CSV files with a header row,
+#
+#   t,Tke,Yae,Yce,YO2,vmean
+#   0,300,2.1e-3,4.0e-4,0.10,2.4
+#   1,301.5,...
+#
+# where columns can be renamed to channel names and scaled to SI units on
+# loading, e.g. rename={'CO_ppm': 'Yae'}, scale={'Yae': 1E-6}.
+
+CHANNELS = ('Tke', 'Yae', 'Ybe', 'Yce', 'YO2', 'vmean', 'Mflow')
+
+
+class Schedule(object):
+
+    def __init__(self, t, **channels):
+        # t        - breakpoint times, strictly increasing
+        # channels - values at the breakpoints, each (len(t),) or
+        #            (len(t),)+lead for per-member values of an ensemble
+        self.t = np.asarray(t, dtype=float).ravel()
+        if len(self.t) == 0:
+            raise ValueError('a schedule needs at least one breakpoint')
+        if np.any(np.diff(self.t) <= 0):
+            raise ValueError('schedule times must be strictly increasing')
+        unknown = set(channels)-set(CHANNELS)
+        if unknown:
+            raise ValueError('unknown schedule channels %s' % ', '.join(sorted(unknown)))
+        self.names = tuple(name for name in CHANNELS if name in channels)
+        self.values = {}
+        self.slopes = {}
+        dt = np.diff(self.t)
+        for name in self.names:
+            v = np.asarray(channels[name], dtype=float)
+            if v.shape[:1] != self.t.shape:
+                raise ValueError('channel %s has %d values for %d times' % (name, len(v), len(self.t)))
+            self.values[name] = v
+            if len(self.t) > 1:
+                self.slopes[name] = np.diff(v, axis=0)/dt.reshape((-1,)+(1,)*(v.ndim-1))
+            else:
+                self.slopes[name] = np.zeros_like(v)
+
+    @classmethod
+    def from_csv(cls, path, rename=None, scale=None, time='t'):
+        # Schedule from a CSV file with a header row; columns other than the
+        # time and the channels are ignored
+        rename = rename or {}
+        scale = scale or {}
+        data = np.genfromtxt(path, delimiter=',', names=True, deletechars='', ndmin=1)
+        channels = {}
+        for column in data.dtype.names:
+            name = rename.get(column, column)
+            if name in CHANNELS:
+                channels[name] = data[column]*scale.get(name, 1.0)
+        if time not in data.dtype.names:
+            raise ValueError('%s has no time column %r' % (path, time))
+        return cls(data[time]*scale.get(time, 1.0), **channels)
+
+    @property
+    def breakpoints(self):
+        return self.t
+
+    def digest(self):
+        # Hash of the breakpoints and the channel values, e.g. to tell
+        # whether a checkpoint was made under this schedule
+        h = hashlib.sha256(np.ascontiguousarray(self.t).tobytes())
+        for name in self.names:
+            h.update(name.encode())
+            h.update(np.ascontiguousarray(self.values[name]).tobytes())
+        return h.hexdigest()
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def __call__(self, t):
+        # Channel values at time t, as a dict
+        t0, t1 = self.t[0], self.t[-1]
+        t = min(max(t, t0), t1)
+        k = min(max(np.searchsorted(self.t, t, side='right')-1, 0), max(len(self.t)-2, 0))
+        dt = t-self.t[k]
+        return dict((name, self.values[name][k]+self.slopes[name][k]*dt) for name in self.names)
+
+    def sample(self, t):
+        # Channel values at all times t at once, as a dict of arrays
+        # (len(t),)+lead
+        t = np.clip(np.asarray(t, dtype=float), self.t[0], self.t[-1])
+        k = np.clip(np.searchsorted(self.t, t, side='right')-1, 0, max(len(self.t)-2, 0))
+        dt = t-self.t[k]
+        values = {}
+        for name in self.names:
+            v = self.values[name]
+            values[name] = v[k]+self.slopes[name][k]*dt.reshape(dt.shape+(1,)*(v.ndim-1))
+        return values
+
+
+def lightoff_programme(Tke):
+    # Temperature programme of the light-off experiment, from and back to the
+    # entering temperature Tke (a scalar or one per ensemble member)
+    rt1=200.0                # linear ramp time in second
+    rt2=500.0                # linear ramp time in second
+    rt3=300.0                # 300 s of constant temperature
+    rt4=100.0                # linear ramp time in second
+    rt5=200.0                # linear ramp time in second
+    rt6=500.0                # linear ramp time in second
+    Tkef1=505.0              # temperature point 1
+    Tkef2=543.0              # temperature point 2, max
+    Tkef4=485.0              # temperature point 3
+    Tkef5=445.0              # temperature point 4
+
+    t = np.cumsum([0.0, rt1, rt2, rt3, rt4, rt5, rt6])
+    T = np.broadcast_arrays(Tke, Tkef1, Tkef2, Tkef2, Tkef4, Tkef5, Tke)
+    return Schedule(t, Tke=np.array(T, dtype=float))
@@ -0,0 +1,93 @@
+import numpy as np
+
+from catconv.model import Model
+
+# Forward parameter sensitivities of the transient model.
+#
+# Sensitivity integrates the state y together with its sensitivities
+# S_k = dy/dx_k to the relative changes x_k of kinetic constants,
+# value_k = value0_k*exp(x_k), in one solve. The sensitivity equations
+#
+#   dS_k/dt = J(y) S_k + df/dx_k
+#
+# are evaluated as the directional difference (f(y + eps*S_k, x + eps*e_k) -
+# f(y, x))/eps, and the nominal and all perturbed states are evaluated as one
+# batch of nf+1 members, the ensemble layout with per-member kinetic
+# constants. One right-hand side evaluation of the extended system is
+# therefore a single vectorised pde call, and the solver's Newton matrix is
+# the block diagonal batch Jacobian, which is exact for the state block and
+# the usual simultaneous-corrector approximation for the sensitivities.
+# The state is (nf+1, n): y in row 0, S_k in row k+1.
+#
+# By default the sensitivities take no part in the local error test
+# (errcon=False): they follow the steps chosen for y, which costs about half
+# as many steps as controlling them as well and keeps the gradients accurate
+# to a few parts in 1E4. eps trades the truncation error of the difference
+# against rounding; 1E-4 keeps both well below that.
+
+# Fittable constants: the pre-exponential factors and activation
+# temperatures of the LHHW constants k1 .. k5 (see Parameters.pre/act)
+PRE = ('pf', 'pg', 'pt', 'pv', 'pw')
+ACT = ('act1', 'act2', 'act3', 'act4', 'act5')
+
+
+class Sensitivity(Model):
+
+    def __init__(self, names, p=None, nz=5, ns=5, nu=3, schedule=None, eps=1E-4, errcon=False):
+        # names  - the fitted constants, from PRE and ACT
+        # eps    - step of the directional differences in x
+        # errcon - include the sensitivities in the local error test
+        for name in names:
+            if name not in PRE+ACT:
+                raise ValueError('%r is not a kinetic constant; fit one of %s'
+                                 % (name, ', '.join(PRE+ACT)))
+        Model.__init__(self, p, nz, ns, nu, lead=(len(names)+1,), schedule=schedule)
+        self.names = tuple(names)
+        self.eps = eps
+        self.errcon = errcon
+
+        # Member k+1 carries the constants with x_k = eps
+        mech = self.pr.mech
+        pre = np.tile(mech.pre, (len(names)+1, 1))
+        act = np.tile(mech.act, (len(names)+1, 1))
+        for k, name in enumerate(names):
+            if name in PRE:
+                pre[k+1, PRE.index(name)] *= np.exp(eps)
+            else:
+                act[k+1, ACT.index(name)] *= np.exp(eps)
+        mech.set_constants(pre, act)
+        self.yb = np.zeros(self.shape)          # nominal and perturbed states
+
+    def initial(self):
+        # Initial state, with sensitivities zero
+        z = Model.initial(self)
+        z[1:] = 0.0
+        return z
+
+    def tolerances(self, species=1E-8, temperature=1E-5):
+        # Absolute tolerances of the state and of the sensitivities, which
+        # are effectively left out of the error test unless errcon is set
+        atol = np.tile(Model.tolerances(self, species, temperature), (len(self.names)+1, 1))
+        if not self.errcon:
+            atol[1:] *= 1E6
+        return atol
+
+    def _members(self, z):
+        z = np.reshape(z, self.shape)
+        yb = self.yb
+        yb[0] = z[0]
+        np.multiply(z[1:], self.eps, out=yb[1:])
+        yb[1:] += z[0]
+        return yb
+
+    def pde(self, t, z):
+        # Time derivatives of the state and of its sensitivities
+        shape = np.shape(z)
+        f = Model.pde(self, t, self._members(z))
+        f = f.reshape(self.shape)
+        f[1:] -= f[0]
+        f[1:] /= self.eps
+        return f.reshape(shape)
+
+    def jac_values(self, z, t=0.0, update=True):
+        return Model.jac_values(self, self._members(z), t, update)
@@ -0,0 +1,307 @@
+import numpy as np
+import scipy.sparse.linalg
+
+from catconv.model import Model
+
+# Steady states and quasi-steady light-off curves.
+#
+# SteadyState holds the entering gas at fixed values, inlet[...,3] = Tke
+# instead of the temperature programme, and solves pde(t, y) = 0 on the same
+# discretisation by Newton's method. The linear systems are solved either
+# directly, with a sparse LU factorisation of the analytic Jacobian, or by
+# GMRES on finite-difference Jacobian products preconditioned with that LU
+# (Newton-Krylov). The analytic Jacobian freezes the temperature dependence of
+# the transport coefficients, so the direct solver converges linearly but
+# cheaply; Newton-Krylov converges quadratically at the price of many more
+# residual evaluations. A point Newton cannot reach from its start is first
+# relaxed by integrating the transient model towards it.
+#
+# lightoff() traces the outlet conversions against Tke, warm-starting every
+# point from the previous one. Natural continuation steps Tke over the given
+# values and jumps to the other branch at ignition or extinction, as a slow
+# ramp would. Pseudo-arclength continuation follows the solution curve
+# through its turning points, so the ignition and extinction temperatures and
+# the unstable middle branch of a multiplicity region come out as well. Its
+# tangents take the finite-difference Jacobian, transport coefficients
+# included, since the frozen one bends the curve wrongly; a step over which
+# the tangent turns sharply is taken again shorter, so a narrow S is not
+# stepped across. A fold is reported where the points turn back in Tke, at
+# the extreme of the Hermite interpolant along the arclength.
+
+TSCALE = 100.0                      # temperature scale of the arclength, K
+TURN = 0.9                          # least cosine between the tangents of a step
+
+
+class SteadyState(Model):
+
+    def __init__(self, p=None, nz=5, ns=5, nu=3):
+        Model.__init__(self, p, nz, ns, nu)
+        # Typical magnitude of every state entry, for norms and the arclength
+        self.scale = np.empty(self.lay.n)
+        for name in self.lay.species_fields:
+            self.scale[self.lay.slices[name]] = max(self.inlet[:3])
+        for name in self.lay.temperature_fields:
+            self.scale[self.lay.slices[name]] = self.inlet[3]
+        self.stats = dict(newton=0, lu=0, rhs=0, relax=0)
+
+    def entering(self, t):
+        self.Yge[...] = self.inlet
+        return self.Yge
+
+    def residual(self, y, Tke=None):
+        # pde(t, y) with the entering temperature Tke
+        if Tke is not None:
+            self.inlet[3] = Tke
+        self.stats['rhs'] += 1
+        return self.pde(0.0, y)
+
+    def _trial(self, y, Tke=None):
+        # residual() at a trial state of an iteration, which may hold
+        # negative fractions or temperatures; returns it and its norm,
+        # infinite where the residual is not finite
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            F = self.residual(y, Tke)
+        return F, (self._norm(F) if np.all(np.isfinite(F)) else np.inf)
+
+    def feed(self, Tke):
+        # State filled with the entering gas at Tke, the start of a first point
+        self.inlet[3] = Tke
+        y = np.zeros(self.lay.n)
+        self.lay.gas(y)[...] = self.inlet[:,None]
+        self.lay.washcoat(y)[...] = self.inlet[:,None,None]
+        if self.nu > 0:
+            self.lay.cordierite(y)[...] = self.inlet[3]
+        return y
+
+    def _norm(self, dy):
+        return np.max(np.abs(dy)/self.scale)
+
+    def _inner(self, dy1, dT1, dy2, dT2):
+        # Scaled inner product of (state, Tke) pairs for the arclength
+        return np.mean(dy1*dy2/self.scale**2)+dT1*dT2/TSCALE**2
+
+    def _linear(self, y, F, method):
+        # Solver of J(y) x = b at y, where F = residual(y)
+        lu = scipy.sparse.linalg.splu(self.jac(0.0, y).tocsc())
+        self.stats['lu'] += 1
+        if method == 'direct':
+            return lu.solve
+        if method != 'krylov':
+            raise ValueError('unknown linear solver %r' % method)
+
+        def jv(v):
+            h = 1E-7/max(self._norm(v), 1E-300)
+            return (self.residual(y+h*v)-F)/h
+        n = self.lay.n
+        J = scipy.sparse.linalg.LinearOperator((n, n), matvec=jv)
+        M = scipy.sparse.linalg.LinearOperator((n, n), matvec=lu.solve)
+
+        def solve(b):
+            x, info = scipy.sparse.linalg.gmres(J, b, M=M, rtol=1E-6, atol=0, restart=20, maxiter=5)
+            return x
+        return solve
+
+    def newton(self, y, Tke, tol=1E-9, maxiter=50, method='direct'):
+        # Damped Newton iteration for residual(y, Tke) = 0 from y; returns the
+        # solution and the number of iterations
+        y = np.array(y, dtype=float)
+        F, fn = self._trial(y, Tke)
+        for it in range(1, maxiter+1):
+            if not np.isfinite(fn):
+                break
+            dy = -self._linear(y, F, method)(F)
+            a = 1.0
+            while True:
+                y1 = y+a*dy
+                F1, f1 = self._trial(y1)
+                if f1 < fn or a < 1/64.:
+                    break
+                a /= 2
+            y, F, fn = y1, F1, f1
+            self.stats['newton'] += 1
+            if not np.isfinite(fn):
+                break
+            if self._norm(a*dy) < tol:
+                return y, it
+        raise RuntimeError('Newton iteration failed at Tke = %g' % Tke)
+
+    def relax(self, y, Tke, tend=1E4):
+        # Integrate the transient model at fixed Tke from y to tend
+        self.inlet[3] = Tke
+        stats = self.stats
+        y = self.solve([0.0, tend], y)[-1]
+        stats['relax'] += 1
+        self.stats = stats
+        return y
+
+    def steady(self, Tke, y0=None, tol=1E-9, method='direct'):
+        # Steady state at the entering temperature Tke, from y0 or the feed
+        if y0 is None:
+            y0 = self.feed(Tke)
+        try:
+            return self.newton(y0, Tke, tol, method=method)[0]
+        except RuntimeError:
+            return self.newton(self.relax(y0, Tke), Tke, tol, method=method)[0]
+
+    def outlet(self, Y):
+        # Outlet conversions of states Y (..., n)
+        Ya, Yc = self.lay.gas(Y)[...,[0,2],-1].T
+        Yae, Yce = self.inlet[0], self.inlet[2]
+        return dict(COconv=(Yae-Ya)/Yae, HCconv=(Yce-Yc)/Yce)
+
+    def lightoff(self, Tke, y0=None, continuation='arclength', method='direct',
+                 ds=0.05, ds_max=0.5, tol=1E-9, max_points=5000):
+        # Quasi-steady light-off curve over the entering temperatures Tke.
+        # Natural continuation returns one point per Tke; arclength returns
+        # the points along the curve from Tke[0] to Tke[-1], with ds the
+        # first step in the scaled (state, Tke/TSCALE) arclength. The result
+        # holds Tke, the states y, COconv, HCconv and, for arclength, the
+        # turning points in 'folds'.
+        Tke = np.asarray(Tke, dtype=float)
+        y = self.steady(Tke[0], y0, tol, method)
+        if continuation == 'natural':
+            Ys = self._natural(Tke, y, tol, method)
+            folds = []
+        elif continuation == 'arclength':
+            T, Ys, folds = self._arclength(Tke[0], Tke[-1], y, ds, ds_max, tol, method, max_points)
+            Tke = np.array(T)
+        else:
+            raise ValueError('unknown continuation %r' % continuation)
+        Y = np.array(Ys)
+        result = dict(Tke=Tke, y=Y, folds=folds)
+        result.update(self.outlet(Y))
+        return result
+
+    def _natural(self, Tke, y, tol, method):
+        Ys = [y]
+        for k in range(1, len(Tke)):
+            guess = Ys[-1]
+            if k > 1:
+                # secant predictor along the last two points
+                guess = guess+(Ys[-1]-Ys[-2])*(Tke[k]-Tke[k-1])/(Tke[k-1]-Tke[k-2])
+            try:
+                y = self.newton(guess, Tke[k], tol, method=method)[0]
+            except RuntimeError:
+                # the branch ended: relax onto the other one from the last point
+                y = self.steady(Tke[k], Ys[-1], tol, method)
+            Ys.append(y)
+        return Ys
+
+    def _exact(self, y, Tke):
+        # Jacobian of residual(., Tke) at y by finite differences, transport
+        # coefficients included; columns a whole band apart in the node-major
+        # order share no rows, so it takes one residual per band column
+        J, n = self.J, self.lay.n
+        w = J.lband+J.uband+1
+        zn = y[J.perm]
+        h = 1E-7*np.maximum(np.abs(zn), self.scale[J.perm])
+        F = self.residual(y, Tke)[J.perm]
+        offsets = np.arange(-J.uband, J.lband+1)
+        rows, cols, vals = [], [], []
+        for g in range(min(w, n)):
+            c = np.arange(g, n, w)
+            z1 = zn.copy()
+            z1[c] += h[c]
+            dF = self.residual(z1[J.iperm])[J.perm]-F
+            r = c[:,None]+offsets
+            keep = (r >= 0) & (r < n)
+            cc = np.broadcast_to(c[:,None], r.shape)[keep]
+            rows.append(r[keep])
+            cols.append(cc)
+            vals.append(dF[r[keep]]/h[cc])
+        rows, cols, vals = [np.concatenate(a) for a in (rows, cols, vals)]
+        return scipy.sparse.csc_matrix((vals, (J.perm[rows], J.perm[cols])), shape=(n, n))
+
+    def _tangent(self, y, T, previous=None):
+        # Unit tangent (ty, tT) of the solution curve at (y, T), oriented
+        # along previous, or towards increasing T. The curve bends with the
+        # transport coefficients, so the Jacobian is the finite-difference
+        # one rather than the analytic one of the corrector.
+        FT = (self.residual(y, T+0.5)-self.residual(y, T-0.5))/1.0
+        b = scipy.sparse.linalg.splu(self._exact(y, T)).solve(FT)
+        self.stats['lu'] += 1
+        ty, tT = -b, 1.0
+        size = np.sqrt(self._inner(ty, tT, ty, tT))
+        ty, tT = ty/size, tT/size
+        if previous is not None and self._inner(ty, tT, *previous) < 0:
+            ty, tT = -ty, -tT
+        return ty, tT
+
+    def _corrector(self, y, T, y0, T0, ty, tT, ds, tol, method, maxiter=15):
+        # Newton iteration on the residual bordered with the arclength
+        # condition <(y-y0, T-T0), (ty, tT)> = ds
+        for it in range(1, maxiter+1):
+            F, fn = self._trial(y, T)
+            if not np.isfinite(fn):
+                break
+            FT = self.residual(y, T+1.0)-F
+            self.inlet[3] = T
+            solve = self._linear(y, F, method)
+            a = solve(-F)
+            b = solve(FT)
+            N = self._inner(y-y0, T-T0, ty, tT)-ds
+            dT = (-N-self._inner(a, 0, ty, 0))/(tT/TSCALE**2-self._inner(b, 0, ty, 0))
+            dy = a-dT*b
+            y, T = y+dy, T+dT
+            self.stats['newton'] += 1
+            if not np.all(np.isfinite(y)):
+                break
+            if self._norm(dy) < tol and abs(dT)/TSCALE < tol:
+                return y, T, it
+        raise RuntimeError('arclength corrector failed at Tke = %g' % T)
+
+    def _arclength(self, T0, T1, y, ds, ds_max, tol, method, max_points):
+        direction = 1.0 if T1 >= T0 else -1.0
+        ty, tT = self._tangent(y, T0)
+        ty, tT = direction*ty, direction*tT
+        Ts, Ys, Ss, tTs, folds = [T0], [y], [0.0], [tT], []
+        while len(Ts) < max_points:
+            y0, T0 = Ys[-1], Ts[-1]
+            try:
+                y, T, it = self._corrector(y0+ds*ty, T0+ds*tT, y0, T0, ty, tT, ds, tol, method)
+            except RuntimeError:
+                ds /= 2
+                if ds < 1E-8:
+                    raise RuntimeError('arclength continuation stalled at Tke = %g' % T0)
+                continue
+            if (T-T1)*direction > 0:
+                # past the end: finish on T1 from the last point
+                y = self.newton(y0+(y-y0)*(T1-T0)/(T-T0), T1, tol, method=method)[0]
+                Ts.append(T1)
+                Ys.append(y)
+                break
+            t1 = self._tangent(y, T, (ty, tT))
+            if self._inner(t1[0], t1[1], ty, tT) < TURN and ds > 1E-6:
+                # the curve turns sharply within the step, which may pass
+                # over a pair of folds: take it again shorter
+                ds /= 2
+                continue
+            ty, tT = t1
+            Ts.append(T)
+            Ys.append(y)
+            Ss.append(Ss[-1]+ds)
+            tTs.append(tT)
+            if len(Ts) > 2 and (Ts[-1]-Ts[-2])*(Ts[-2]-Ts[-3]) < 0:
+                # the points turned back in Tke
+                folds.append(_fold(Ss[-3:], Ts[-3:], tTs[-3:]))
+            if it <= 4:
+                ds = min(1.5*ds, ds_max)
+        return Ts, Ys, folds
+
+
+def _fold(s, T, dT):
+    # Turning point of the curve T(s) through three points about a reversal
+    # of T, with slopes dT/ds: the extreme of the cubic Hermite interpolant
+    # over the step where the slope changes sign, the middle point if none
+    # does
+    for k in (0, 1):
+        if dT[k]*dT[k+1] <= 0:
+            h = s[k+1]-s[k]
+            T0, T1, m0, m1 = T[k], T[k+1], dT[k]*h, dT[k+1]*h
+            # T(x) = T0 + m0*x + b*x**2 + c*x**3 on x = 0 .. 1
+            b = 3*(T1-T0)-2*m0-m1
+            c = 2*(T0-T1)+m0+m1
+            x = [r.real for r in np.roots([3*c, 2*b, m0]) if abs(r.imag) < 1E-12 and 0 <= r.real <= 1]
+            if x:
+                return T0+x[0]*(m0+x[0]*(b+x[0]*c))
+    return T[1]
@@ -0,0 +1,257 @@
+import numpy as np
+
+# Finite-difference stencils of the transient monolith model evaluated on whole
+# arrays. Fields are stacked along the leading axes, so one call covers CO,
+# CO2, C3H8 and temperature together (and any batch axes in front of them).
+# Gas fields have shape lead+(nz,), washcoat fields have shape lead+(nz,ns).
+#
+# The fields are copied into ghost-padded work buffers once per call:
+#   gas      - inlet ghost node upstream of i = 0, mirrored node past the outlet
+#   washcoat - mirrored rows at both axial ends and a column past the
+#              cordierite wall, which only pads the flat offsets
+#   cordierite (when u is given) - the washcoat wall node before u = du,
+#              a mirrored column past the mid-plane of the wall at u0 and
+#              mirrored rows at both axial ends (or the neighbours' at
+#              cuts); it is a single field, so
+#              its buffers only carry the batch axes, lead[:-1]
+# A slice cut out of a longer channel passes the values of its neighbours
+# for the ghost nodes at the cuts instead of the mirrored ones.
+# Each padded buffer is then swept as one flat contiguous array in which the
+# axial and radial neighbours are fixed offsets, so every stencil is a single
+# 1-D slice expression. Values computed on the ghost nodes are never read. All
+# buffers and views are set up once; the returned arrays are overwritten on
+# the next call.
+#
+# The radial washcoat grid s need not be uniform. Once the catalyst lights
+# off, the concentrations fall steeply within the first micrometres below
+# the gas interface and are nearly flat towards the wall, so a grid graded
+# towards s = 0 (washcoat_grid) resolves them with far fewer nodes. The
+# radial derivatives use the three-point weights of the local spacings
+# (radial_weights), second order on any smoothly graded grid.
+
+
+def washcoat_grid(s0, ns, ratio=1.0):
+    # ns radial nodes from the gas interface (s = 0) to the wall (s0), the
+    # spacings growing geometrically so that the last is ratio times the
+    # first; ratio = 1 gives the uniform grid. A spacing more than twice the
+    # one before makes the left weight of (1/s)*dY/ds negative at the first
+    # interior node, and the concentrations lose their positivity, so the
+    # growth per spacing is limited to 2.
+    if ns < 2:
+        raise ValueError('the washcoat needs at least 2 radial nodes')
+    if ratio <= 0:
+        raise ValueError('the grading ratio must be positive')
+    if ns == 2 or ratio == 1.0:
+        return np.linspace(0, s0, ns)
+    if ratio > 2.0**(ns-2):
+        raise ValueError('grading ratio %g is too strong for %d radial nodes, at most %g'
+                         % (ratio, ns, 2.0**(ns-2)))
+    h = float(ratio)**(np.arange(ns-1)/(ns-2.0))
+    s = np.concatenate(([0.0], np.cumsum(h)))*(s0/h.sum())
+    s[-1] = s0
+    return s
+
+
+def radial_weights(s):
+    # Weights (left, centre, right) per column of the radial washcoat
+    # stencil d2Y/ds2 + (1/s)*dY/ds on the grid s:
+    #   column 0          zero, closed by interface()
+    #   columns 1..ns-2   d2Y/ds2 and (1/s)*dY/ds from the two neighbours
+    #                     at their own distances
+    #   column ns-1       d2Y/ds2 mirrored at the wall, 2*(Yl-Y)/h**2; the
+    #                     right weight is zero
+    s = np.asarray(s, dtype=float)
+    ns = len(s)
+    left = np.zeros(ns)
+    centre = np.zeros(ns)
+    right = np.zeros(ns)
+    hl = s[1:-1]-s[:-2]
+    hr = s[2:]-s[1:-1]
+    hs = hl+hr
+    left[1:-1] = (2.0-hr/s[1:-1])/(hl*hs)
+    right[1:-1] = (2.0+hl/s[1:-1])/(hr*hs)
+    centre[1:-1] = ((hr-hl)/s[1:-1]-2.0)/(hl*hr)
+    hw = s[-1]-s[-2]
+    left[-1] = 2.0/hw**2
+    centre[-1] = -2.0/hw**2
+    return left, centre, right
+
+
+class Stencils(object):
+
+    def __init__(self, nz, ns, dz, s, lead=(4,), u=None):
+        lead = tuple(lead)
+        self.nz = nz
+        self.ns = ns
+        self.dz = dz
+        self.ds = s[1]-s[0]                     # first radial spacing, at the interface
+        self.dzs = dz**2
+        self.dss = self.ds**2
+
+        # Gas, one padded row per field: [Ye, Y_0 .. Y_nz-1, Y_nz-2]
+        G = self.G = np.zeros(lead+(nz+2,))
+        self.Gin = G[...,0]
+        self.Gy = G[...,1:-1]
+        self.Gout = G[...,-1]
+        Gf = G.reshape(-1)
+        n = Gf.size
+        self.gx = Gf[1:n-1]
+        self.gl = Gf[0:n-2]
+        self.gr = Gf[2:n]
+        self.gt = np.zeros(n-2)
+        Yzz = np.zeros(n)
+        Yz = np.zeros(n)
+        self.gzz = Yzz[1:n-1]
+        self.gz = Yz[1:n-1]
+        self.Yzz = Yzz.reshape(G.shape)[...,1:-1]
+        self.Yz = Yz.reshape(G.shape)[...,1:-1]
+
+        # Washcoat, padded to lead+(nz+2,ns+1): ghost rows at both axial ends
+        # and a zero column past the wall. Flat offsets are +-1 radially and
+        # +-m axially.
+        m = ns+1
+        W = self.W = np.zeros(lead+(nz+2,m))
+        self.Wy = W[...,1:-1,:-1]
+        self.Wtop = W[...,0,:-1]
+        self.Wbot = W[...,-1,:-1]
+        Wf = W.reshape(-1)
+        lo = m
+        hi = Wf.size-m
+        self.wx = Wf[lo:hi]
+        self.wu = Wf[lo-m:hi-m]
+        self.wd = Wf[lo+m:hi+m]
+        self.wl = Wf[lo-1:hi-1]
+        self.wr = Wf[lo+1:hi+1]
+        self.wt = np.zeros(hi-lo)
+        self.wt2 = np.zeros(hi-lo)
+        lap = np.zeros(Wf.size)
+        self.wlap = lap[lo:hi]
+        self.lap = lap.reshape(W.shape)[...,1:-1,:-1]
+
+        # Radial weights per flat node, see radial_weights(); the column
+        # past the wall gets none
+        jj = np.arange(lo,hi) % m
+        pad = np.zeros(1)
+        left, centre, right = [np.concatenate((w, pad))[jj] for w in radial_weights(s)]
+        self.wlw = left
+        self.wcw = centre
+        self.wrw = right
+
+        self.Jn = np.zeros(lead+(nz,))
+        self.Jf = np.zeros(lead+(nz,))
+
+        # Cordierite, padded to lead[:-1]+(nz+2,nu+2): [Tw, Tku_0 .. Tku_nu-1,
+        # Tku_nu-2] radially, ghost rows axially
+        if u is not None:
+            nu = len(u)
+            self.dus = (u[1]-u[0] if nu > 1 else u[0])**2
+            m = nu+2
+            C = self.C = np.zeros(lead[:-1]+(nz+2,m))
+            self.Cy = C[...,1:-1,1:-1]
+            self.Cwall = C[...,1:-1,0]
+            self.Cmid = C[...,1:-1,-1]
+            self.Cmirror = C[...,1:-1,nu-1]
+            self.Ctop = C[...,0,:]
+            self.Cbot = C[...,-1,:]
+            Cf = C.reshape(-1)
+            lo = m
+            hi = Cf.size-m
+            self.cx = Cf[lo:hi]
+            self.cu = Cf[lo-m:hi-m]
+            self.cd = Cf[lo+m:hi+m]
+            self.cl = Cf[lo-1:hi-1]
+            self.cr = Cf[lo+1:hi+1]
+            self.ct = np.zeros(hi-lo)
+            self.ct2 = np.zeros(hi-lo)
+            clap = np.zeros(Cf.size)
+            self.cwlap = clap[lo:hi]
+            self.clap = clap.reshape(C.shape)[...,1:-1,1:-1]
+
+    def gas(self, Yg, Yge, Ygo=None):
+        # Second (Yzz) and upwind first (Yz) axial derivatives of the gas
+        # fields, Yge holds the entering values, Ygo the values past the
+        # outlet (mirrored when None)
+        self.Gy[...] = Yg
+        self.Gin[...] = Yge
+        self.Gout[...] = Yg[...,-2] if Ygo is None else Ygo
+
+        t = self.gt
+        np.multiply(self.gx, 2.0, out=t)
+        np.add(self.gr, self.gl, out=self.gzz)
+        np.subtract(self.gzz, t, out=self.gzz)
+        np.divide(self.gzz, self.dzs, out=self.gzz)
+
+        np.subtract(self.gx, self.gl, out=self.gz)
+        np.divide(self.gz, self.dz, out=self.gz)
+        return self.Yzz, self.Yz
+
+    def washcoat(self, Ysw, top=None, bottom=None):
+        # Sum of the washcoat transport stencils, Yss + Ysss + Yszz:
+        #   Yss  - (1/s)*dY/ds, interior nodes only (zero at the interface and
+        #          at the wall)
+        #   Ysss - d2Y/ds2, zero at the gas interface, mirrored at the wall,
+        #          on the local spacings of s
+        #   Yszz - axial d2Y/dz2, zero-gradient at both ends unless the rows
+        #          before the first (top) and past the last (bottom) are given
+        # Column 0 therefore only carries Yszz; the caller adds the
+        # interface flux from interface().
+        self.Wy[...] = Ysw
+        self.Wtop[...] = Ysw[...,1,:] if top is None else top
+        self.Wbot[...] = Ysw[...,-2,:] if bottom is None else bottom
+
+        t, t2, lap = self.wt, self.wt2, self.wlap
+        np.multiply(self.wx, 2.0, out=t)
+
+        np.add(self.wd, self.wu, out=lap)
+        np.subtract(lap, t, out=lap)
+        np.divide(lap, self.dzs, out=lap)
+
+        np.multiply(self.wl, self.wlw, out=t2)
+        np.add(lap, t2, out=lap)
+        np.multiply(self.wx, self.wcw, out=t2)
+        np.add(lap, t2, out=lap)
+        np.multiply(self.wr, self.wrw, out=t2)
+        np.add(lap, t2, out=lap)
+        return self.lap
+
+    def interface(self, Ysw, dYi, De, km):
+        # Flux balance at the gas/washcoat interface (jj = 0): radial
+        # diffusion into the washcoat, 4*De*dY/ds over half the first cell,
+        # plus film transfer km*dYi from the bulk gas, dYi = Yg - Ys[..., 0].
+        # De has the shape of Ysw, km and dYi the shape of the gas fields.
+        Jn, Jf = self.Jn, self.Jf
+        np.subtract(Ysw[...,1], Ysw[...,0], out=Jn)
+        np.multiply(Jn, De[...,0], out=Jn)
+        np.multiply(Jn, 4.0/self.dss, out=Jn)
+        np.multiply(dYi, km, out=Jf)
+        np.divide(Jf, self.ds, out=Jf)
+        np.add(Jn, Jf, out=Jn)
+        return Jn
+
+    def cordierite(self, Tku, Tw, top=None, bottom=None):
+        # Radial and axial d2T/du2 + d2T/dz2 of the cordierite temperatures
+        # Tku, joined to the washcoat wall node Tw at u = 0, zero-gradient at
+        # the mid-plane u0, and at both axial ends unless the rows before the
+        # first (top) and past the last (bottom) are given
+        self.Cy[...] = Tku
+        self.Cwall[...] = Tw
+        self.Cmid[...] = self.Cmirror
+        self.Ctop[...] = self.C[...,2,:]
+        self.Cbot[...] = self.C[...,-3,:]
+        if top is not None:
+            self.Ctop[...,1:-1] = top
+        if bottom is not None:
+            self.Cbot[...,1:-1] = bottom
+
+        t, t2, lap = self.ct, self.ct2, self.cwlap
+        np.multiply(self.cx, 2.0, out=t)
+
+        np.add(self.cd, self.cu, out=lap)
+        np.subtract(lap, t, out=lap)
+        np.divide(lap, self.dzs, out=lap)
+
+        np.add(self.cr, self.cl, out=t2)
+        np.subtract(t2, t, out=t2)
+        np.divide(t2, self.dus, out=t2)
+        np.add(lap, t2, out=lap)
+        return self.clap
@@ -0,0 +1,202 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from catconv.layout import Layout
+
+# Streaming on-disk storage of model output.
+#
+# A store is a directory of fixed-size chunks, each two .npy files holding the
+# output times (count,) and the states (count,)+shape of consecutive output
+# steps, plus index.json describing the layout and listing the chunks written
+# so far:
+#
+#   index.json   {"nz", "ns", "nu", "shape", "chunk", "meta", "chunks": [...]}
+#   t_00000.npy  y_00000.npy  t_00001.npy  y_00001.npy ...
+#
+# Writer.append() copies a state into the current chunk buffer. Full chunks
+# are handed to a background thread that writes them and then replaces the
+# index, so the integration loop does not wait for the disk and at most a
+# few chunks are ever held in memory. The index only ever lists complete
+# chunks, so a store can be read while the run is still going.
+#
+# Store opens the chunks memory-mapped and only reads what is asked for:
+# field() gathers one field (or one node of it, e.g. the outlet) over all
+# steps, chunks() iterates over the raw chunks for larger post-processing.
+
+INDEX = 'index.json'
+
+
+class Writer(object):
+
+    def __init__(self, path, lay, shape=None, chunk=None, meta=None, queued=2, resume=None):
+        # path  - store directory, created if needed; an existing store there
+        #         is replaced
+        # lay   - layout.Layout of the states
+        # shape - shape of one output state, lay.n by default (for an
+        #         ensemble (N, lay.n))
+        # chunk - output steps per chunk, about 4 MB of states by default
+        # meta  - JSON-serialisable run description kept in the index
+        # resume - state() of a writer to this store to carry on from, as
+        #          saved in a checkpoint; the chunks it had written are kept
+        self.path = path
+        self.shape = tuple(shape or (lay.n,))
+        size = int(np.prod(self.shape))
+        self.chunk = chunk or max(1, (4 << 20)//(8*size))
+        self.index = dict(nz=lay.nz, ns=lay.ns, nu=lay.nu, shape=list(self.shape),
+                          chunk=self.chunk, meta=meta or {}, chunks=[])
+        keep = 0
+        if resume is not None:
+            keep = int(resume['chunks'])
+            with open(os.path.join(path, INDEX)) as fh:
+                old = json.load(fh)
+            if old['shape'] != self.index['shape'] or len(old['chunks']) < keep:
+                raise ValueError('store %s does not match the writer to resume' % path)
+            self.chunk = self.index['chunk'] = old['chunk']
+            self.index['chunks'] = old['chunks'][:keep]
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name in os.listdir(path):
+            if name == INDEX or (name[:2] in ('t_', 'y_') and name.endswith('.npy')
+                                 and int(name[2:-4]) >= keep):
+                os.remove(os.path.join(path, name))
+        self._write_index()
+
+        self.count = 0                          # steps appended
+        self._queued = keep                     # chunks handed to the thread
+        self._written = sum(c['count'] for c in self.index['chunks'])   # steps written to disk
+        self._new_buffers()
+        if resume is not None:
+            self._n = len(resume['t'])
+            self._t[:self._n] = resume['t']
+            self._y[:self._n] = resume['y']
+            self.count = int(resume['count'])
+        self._error = None
+        self._queue = queue.Queue(maxsize=queued)
+        self._thread = threading.Thread(target=self._drain)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _new_buffers(self):
+        self._t = np.zeros(self.chunk)
+        self._y = np.zeros((self.chunk,)+self.shape)
+        self._n = 0
+
+    def append(self, t, y):
+        # Add one output step
+        if self._error is not None:
+            raise self._error
+        self._t[self._n] = t
+        self._y[self._n] = y
+        self._n += 1
+        self.count += 1
+        if self._n == self.chunk:
+            self._flush()
+
+    def state(self):
+        # What a checkpoint needs to resume writing after the steps appended
+        # so far: the number of chunks, which are first waited for, and the
+        # steps not yet in a chunk
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+        return dict(chunks=self._queued, count=self.count, t=self._t[:self._n], y=self._y[:self._n])
+
+    def _flush(self):
+        if self._n:
+            self._queue.put((self._queued, self._t[:self._n], self._y[:self._n]))
+            self._queued += 1
+            self._new_buffers()
+
+    def _drain(self):
+        # Background thread: write queued chunks in order
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            k, t, y = item
+            try:
+                if self._error is None:
+                    np.save(os.path.join(self.path, 't_%05d.npy' % k), t)
+                    np.save(os.path.join(self.path, 'y_%05d.npy' % k), y)
+                    self.index['chunks'].append(dict(start=self._written, count=len(t)))
+                    self._written += len(t)
+                    self._write_index()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write_index(self):
+        tmp = os.path.join(self.path, INDEX+'.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(self.index, fh)
+        os.replace(tmp, os.path.join(self.path, INDEX))
+
+    def close(self):
+        # Write the last, partial chunk and wait for the writer thread
+        if self._thread is None:
+            return
+        self._flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Store(object):
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX)) as fh:
+            self.index = json.load(fh)
+        self.lay = Layout(self.index['nz'], self.index['ns'], self.index['nu'])
+        self.shape = tuple(self.index['shape'])
+        self.meta = self.index['meta']
+        self.n_chunks = len(self.index['chunks'])
+
+    def __len__(self):
+        return sum(c['count'] for c in self.index['chunks'])
+
+    def chunk(self, k):
+        # Times and states of chunk k, memory-mapped
+        t = np.load(os.path.join(self.path, 't_%05d.npy' % k))
+        y = np.load(os.path.join(self.path, 'y_%05d.npy' % k), mmap_mode='r')
+        return t, y
+
+    def chunks(self):
+        # Iterate over (t, y) chunk by chunk
+        for k in range(self.n_chunks):
+            yield self.chunk(k)
+
+    @property
+    def t(self):
+        return np.concatenate([self.chunk(k)[0] for k in range(self.n_chunks)] or [np.zeros(0)])
+
+    def field(self, name, index=Ellipsis):
+        # Field or block name over all steps, (nt,)+lead+grid shape, or only
+        # field[..., index] of it, e.g. index=-1 for the outlet node
+        parts = []
+        for t, y in self.chunks():
+            a = self.lay.view(y, name)
+            parts.append(np.array(a if index is Ellipsis else a[...,index]))
+        return np.concatenate(parts) if parts else np.zeros(0)
+
+    def __getitem__(self, k):
+        # State of output step k
+        if k < 0:
+            k += len(self)
+        for c, info in enumerate(self.index['chunks']):
+            if k < info['start']+info['count']:
+                return np.array(self.chunk(c)[1][k-info['start']])
+        raise IndexError('output step out of range')
@@ -0,0 +1,269 @@
+import json
+import multiprocessing
+import time
+
+import numpy as np
+import scipy.interpolate
+import scipy.stats.qmc
+
+from catconv.parameters import Parameters
+from catconv.steady import SteadyState
+
+# Surrogate of the quasi-steady outlet conversions.
+#
+# Control and optimisation loops need the outlet conversions for far more
+# operating points than the model can solve. A Surrogate maps the operating
+# conditions (any Parameters overrides, by default the entering temperature,
+# CO and C3H8 fractions and the gas velocity) to the steady-state outlet
+# conversions and gas temperature of the full model.
+#
+# Every full-model point is one SteadyState solve of the full
+# discretisation. Where the channel has two steady states, the one that
+# matters is the one a channel filled with the feed settles on, so every
+# solve first relaxes the transient model from the feed and then polishes
+# with Newton.
+#
+# Light-off is steep: CO conversion can jump from a few to seventy percent
+# within 25 K of Tke, at a temperature that moves with the other
+# conditions. A smooth fit over all inputs at once smears that front over
+# the whole box, so the surrogate is built on light-off curves instead:
+#
+#   - the conditions other than Tke are sampled by a scrambled Sobol
+#     sequence or a Latin hypercube, and for each sample the outputs are
+#     solved on a grid of Tke reaching past the box; the curves run in a
+#     process pool, one worker per core by default;
+#   - every curve is shifted by its light-off temperature Tm, where CO
+#     conversion first reaches half its largest value, and resampled on a
+#     common grid of Tke-Tm;
+#   - Tm and the shifted curves are fitted together over the other
+#     conditions, scaled to the unit box, with a thin-plate spline radial
+#     basis interpolant.
+#
+# predict() evaluates the fit at the other conditions, and interpolates the
+# curve linearly at Tke-Tm, on whole arrays of conditions at once: a few
+# microseconds per point. Conversions are clipped to [0, 1]. Beyond the
+# solved Tke range a curve is held at its end values. build() also solves an
+# independent Latin hypercube of held-out full points and keeps the largest
+# and RMS deviations of the surrogate from them in error. A surrogate is
+# saved with its curves and refitted on load, which takes milliseconds.
+#
+#   s = Surrogate.build(n=64, test=64)
+#   s.error['COconv']                      # dict(max=..., rms=...)
+#   s.predict(dict(Tke=T, Yae=..., Yce=..., vmean=...))['COconv']
+
+# Default input box
+BOUNDS = dict(Tke=(400.0, 650.0), Yae=(1E-3, 6E-3), Yce=(2E-4, 1E-3), vmean=(1.0, 5.0))
+
+# Outputs of every sample
+OUTPUTS = ('COconv', 'HCconv', 'Tk')
+
+
+def sample(bounds, n, method='sobol', seed=0):
+    # n points of the box bounds (dict name -> (low, high)) as an (n, d)
+    # array in the order of bounds. Sobol points come in powers of two, so
+    # n is rounded up to the next one.
+    lo, hi = np.array(list(bounds.values()), dtype=float).T
+    if method == 'sobol':
+        m = int(np.ceil(np.log2(max(n, 1))))
+        u = scipy.stats.qmc.Sobol(len(lo), seed=seed).random_base2(m)
+    elif method == 'lhs':
+        u = scipy.stats.qmc.LatinHypercube(len(lo), seed=seed).random(n)
+    else:
+        raise ValueError('unknown sampling method %r' % method)
+    return lo+u*(hi-lo)
+
+
+def point(conditions, nz=5, ns=5, nu=3):
+    # Steady outlet values of the full model at one set of conditions; a
+    # failed solve gives NaN and its message in 'error'
+    p = Parameters(**conditions)
+    m = SteadyState(p, nz, ns, nu)
+    result = dict(error=None)
+    try:
+        with np.errstate(all='ignore'):
+            y = m.newton(m.relax(m.feed(p.Tke), p.Tke), p.Tke)[0]
+    except RuntimeError as e:
+        result.update(dict.fromkeys(OUTPUTS, np.nan), error=str(e))
+        return result
+    result.update(m.outlet(y))
+    result['Tk'] = m.lay.gas(y)[3,-1]
+    return result
+
+
+def _point(args):
+    return point(*args)
+
+
+def points(bounds, X, nz=5, ns=5, nu=3, processes=None):
+    # point() at every row of X (m, d), the conditions in the order of
+    # bounds, as arrays per output, and the errors of the failed ones
+    names = list(bounds)
+    results = _map(_point, [(dict(zip(names, x)), nz, ns, nu) for x in X], processes)
+    values = dict((name, np.array([r[name] for r in results], dtype=float)) for name in OUTPUTS)
+    return values, [r['error'] for r in results if r['error'] is not None]
+
+
+def curve(conditions, Tke, nz=5, ns=5, nu=3):
+    # point() at the conditions along the entering temperatures Tke, arrays
+    # per output
+    results = [point(dict(conditions, Tke=T), nz, ns, nu) for T in Tke]
+    values = dict((name, np.array([r[name] for r in results], dtype=float)) for name in OUTPUTS)
+    return values, [r['error'] for r in results if r['error'] is not None]
+
+
+def _curve(args):
+    return curve(*args)
+
+
+def _map(func, jobs, processes):
+    # func over jobs in a process pool, one worker per core by default
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(jobs))
+    if processes <= 1:
+        return [func(job) for job in jobs]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(func, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def lightoff(Tke, conv):
+    # Light-off temperatures of curves conv (..., len(Tke)): where each
+    # first reaches half its largest value, interpolated linearly; the end
+    # of Tke for curves that never convert
+    conv = np.nan_to_num(conv)
+    half = 0.5*conv.max(axis=-1, keepdims=True)
+    j = np.clip(np.argmax(conv >= half, axis=-1), 1, len(Tke)-1)
+    c0 = np.take_along_axis(conv, j[...,None]-1, -1)[...,0]
+    c1 = np.take_along_axis(conv, j[...,None], -1)[...,0]
+    a = np.clip((half[...,0]-c0)/np.where(c1 > c0, c1-c0, 1.0), 0.0, 1.0)
+    return np.where(half[...,0] > 0, Tke[j-1]+a*(Tke[j]-Tke[j-1]), Tke[-1])
+
+
+class Surrogate(object):
+
+    def __init__(self, bounds, X, Tke, values, shifts=101):
+        # bounds - dict name -> (low, high) of the inputs, Tke among them
+        # X      - (m, d-1) samples of the other inputs, in the order of
+        #          bounds
+        # Tke    - entering temperatures of the curves
+        # values - dict of outputs (m, len(Tke)) along the curves; curves
+        #          with a failed point are left out of the fit
+        # shifts - points of the common Tke-Tm grid
+        if 'Tke' not in bounds:
+            raise ValueError('the surrogate needs Tke among its inputs')
+        self.bounds = dict(bounds)
+        self.names = list(bounds)
+        self.other = [name for name in self.names if name != 'Tke']
+        self.lo, self.hi = np.array([bounds[name] for name in self.other], dtype=float).reshape(-1,2).T
+        self.X = np.asarray(X, dtype=float).reshape(-1, len(self.other))
+        self.Tke = np.asarray(Tke, dtype=float)
+        self.values = dict((name, np.asarray(values[name], dtype=float)) for name in OUTPUTS)
+        ok = np.all([np.all(np.isfinite(v), axis=1) for v in self.values.values()], axis=0)
+        if ok.sum() < len(self.other)+2:
+            raise ValueError('too few successful curves to fit a surrogate')
+
+        # Curves shifted by their light-off temperatures, on a grid of
+        # Tke-Tm that covers the box for every Tm
+        Tm = lightoff(self.Tke, self.values['COconv'][ok])
+        T0, T1 = bounds['Tke']
+        self.shift = np.linspace(T0-Tm.max(), T1-Tm.min(), shifts)
+        curves = [np.array([np.interp(self.shift+t, self.Tke, v) for t, v in zip(Tm, self.values[name][ok])])
+                  for name in OUTPUTS]
+        Y = np.column_stack(curves+[Tm])
+        self.rbf = scipy.interpolate.RBFInterpolator(self._scaled(self.X[ok]), Y,
+                                                     kernel='thin_plate_spline', degree=1)
+        self.error = None
+        self.stats = dict(curves=int(ok.sum()), failed=int((~ok).sum()))
+
+    @classmethod
+    def build(cls, bounds=None, n=64, test=64, grid=51, method='sobol', seed=0,
+              nz=5, ns=5, nu=3, processes=None):
+        # Sample, solve and fit a surrogate over bounds (BOUNDS by default)
+        # from n light-off curves of grid entering temperatures, and
+        # measure its error at test held-out Latin hypercube points
+        bounds = dict(bounds or BOUNDS)
+        other = dict((name, b) for name, b in bounds.items() if name != 'Tke')
+        T0, T1 = bounds['Tke']
+        margin = 0.2*(T1-T0)
+        Tke = np.linspace(T0-margin, T1+margin, grid)
+        X = sample(other, n, method, seed)
+        t0 = time.perf_counter()
+        results = _map(_curve, [(dict(zip(other, x)), Tke, nz, ns, nu) for x in X], processes)
+        wall = time.perf_counter()-t0
+        values = dict((name, np.array([r[0][name] for r in results])) for name in OUTPUTS)
+        s = cls(bounds, X, Tke, values)
+        s.stats.update(wall=wall, errors=sum([r[1] for r in results], []))
+        if test > 0:
+            Xt = sample(bounds, test, 'lhs', seed+1)
+            s.validate(Xt, points(bounds, Xt, nz, ns, nu, processes)[0])
+        return s
+
+    def _scaled(self, X):
+        return (X-self.lo)/(self.hi-self.lo)
+
+    def _inputs(self, X):
+        # (m, d) array of conditions from an array in the order of names or
+        # a dict of columns
+        if isinstance(X, dict):
+            missing = set(self.names)-set(X)
+            if missing:
+                raise ValueError('conditions lack %s' % ', '.join(sorted(missing)))
+            X = np.column_stack(np.broadcast_arrays(*[np.ravel(X[name]) for name in self.names]))
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if X.shape[-1] != len(self.names):
+            raise ValueError('conditions need %d columns, %s' % (len(self.names), ', '.join(self.names)))
+        return X
+
+    def predict(self, X):
+        # Outputs at the conditions X, an (m, d) array in the order of
+        # names or a dict of columns; a dict of (m,) arrays
+        X = self._inputs(X)
+        k = self.names.index('Tke')
+        R = self.rbf(self._scaled(np.delete(X, k, axis=1)))
+        n = len(self.shift)
+        # linear interpolation of every curve at Tke-Tm
+        x = (X[:,k]-R[:,-1]-self.shift[0])/(self.shift[1]-self.shift[0])
+        x = np.clip(x, 0, n-1)
+        j = np.minimum(x.astype(int), n-2)
+        a = x-j
+        rows = np.arange(len(X))
+        out = {}
+        for o, name in enumerate(OUTPUTS):
+            out[name] = (1-a)*R[rows,o*n+j]+a*R[rows,o*n+j+1]
+        for name in ('COconv', 'HCconv'):
+            np.clip(out[name], 0.0, 1.0, out=out[name])
+        return out
+
+    def validate(self, X, values):
+        # Largest and RMS deviation of predict() from full-model values at
+        # X, per output; points that failed are skipped, NaN when all did
+        pred = self.predict(X)
+        self.error = {}
+        for name in OUTPUTS:
+            d = pred[name]-values[name]
+            d = d[np.isfinite(d)]
+            if len(d) == 0:
+                self.error[name] = dict(max=float('nan'), rms=float('nan'), points=0)
+                continue
+            self.error[name] = dict(max=float(np.max(np.abs(d))), rms=float(np.sqrt(np.mean(d**2))),
+                                    points=len(d))
+        return self.error
+
+    def save(self, path):
+        np.savez(path, names=np.array(self.names), bounds=np.array([self.bounds[name] for name in self.names]),
+                 X=self.X, Tke=self.Tke, shifts=len(self.shift), error=json.dumps(self.error),
+                 **dict(('values_'+name, v) for name, v in self.values.items()))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            bounds = dict((str(name), tuple(b)) for name, b in zip(data['names'], data['bounds']))
+            s = cls(bounds, data['X'], data['Tke'], dict((name, data['values_'+name]) for name in OUTPUTS),
+                    int(data['shifts']))
+            if 'error' in data.files:
+                s.error = json.loads(str(data['error']))
+        return s
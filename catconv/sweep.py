@@ -0,0 +1,76 @@
+import multiprocessing
+
+import numpy as np
+
+from catconv.model import Model
+from catconv.parameters import Parameters
+
+# Parameter sweeps over operating conditions.
+#
+# A sweep is a table of scenarios, each a set of Parameters overrides such as
+# Yae, Yce, Tke, vmean, YO2, Mflow, s0 or LPt. The table is given either as a
+# list of dicts, one per scenario, or as a dict of equally long columns. Every
+# scenario is an independent simulation: the worker builds its own Parameters
+# and Model, so no state is shared between runs, and the runs are spread over
+# a process pool with one worker per core by default. Results come back in
+# scenario order.
+
+
+def scenarios(table):
+    # List of per-scenario override dicts from either table form
+    if isinstance(table, dict):
+        names = list(table)
+        columns = [list(table[name]) for name in names]
+        if len(set(len(c) for c in columns)) > 1:
+            raise ValueError('scenario columns differ in length')
+        return [dict(zip(names, row)) for row in zip(*columns)]
+    return [dict(row) for row in table]
+
+
+def outlet(p, lay, Y):
+    # Outlet series and derived metrics of a stored history Y (nt, n)
+    Ya, Yb, Yc, Tk = lay.gas(Y)[...,-1].T
+    rCO = p.Mflow*(p.Yae-Ya)                   # CO reaction rate     #mol/s
+    rHC = p.Mflow*(p.Yce-Yc)                   # HC reaction rate     #mol/s
+    return dict(Ya=Ya, Yb=Yb, Yc=Yc, Tk=Tk,
+                COconv=(p.Yae-Ya)/p.Yae, HCconv=(p.Yce-Yc)/p.Yce,
+                rCO=rCO, rHC=rHC)
+
+
+def run(scenario, tout, nz=5, ns=5, nu=3, rtol=1E-5):
+    # One simulation of the light-off programme with the given overrides. A
+    # failed integration is reported in 'error' rather than raised, so that
+    # it does not end the rest of the sweep.
+    p = Parameters(**scenario)
+    m = Model(p, nz, ns, nu)
+    result = dict(scenario=dict(scenario), t=np.asarray(tout, dtype=float), error=None)
+    try:
+        Y = m.solve(tout, rtol=rtol)
+    except RuntimeError as e:
+        result['error'] = str(e)
+        return result
+    result.update(outlet(p, m.lay, Y))
+    result['stats'] = m.stats
+    return result
+
+
+def _run(args):
+    return run(*args)
+
+
+def sweep(table, tout, nz=5, ns=5, nu=3, rtol=1E-5, processes=None):
+    # Run every scenario of the table; returns the run() results in scenario
+    # order. processes defaults to the number of cores, 1 runs in-process.
+    jobs = [(s, tout, nz, ns, nu, rtol) for s in scenarios(table)]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(jobs))
+    if processes <= 1:
+        return [_run(job) for job in jobs]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_run, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
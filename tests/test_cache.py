@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+
+from catconv import cache
+from catconv.cache import Cache, key
+from catconv.config import Config, simulate
+
+SMALL = dict(nz=4, ns=3, nu=2, tf=300.0, td=10.0)
+
+
+def test_hit(tmp_path):
+    path = str(tmp_path/'cache')
+    first = simulate(Config(cache=path, **SMALL))
+    again = simulate(Config(cache=path, **SMALL))
+    assert not first['cached'] and again['cached']
+    for name in ('Ya', 'Yb', 'Yc', 'Tk'):
+        np.testing.assert_array_equal(again['outlet'][name], first['outlet'][name])
+    np.testing.assert_array_equal(again['t'], first['t'])
+    assert again['stats'] == first['stats']
+    # an override equal to its default is the same run
+    assert simulate(Config(cache=path, parameters=dict(Tke=417.0), **SMALL))['cached']
+
+
+def test_parameter_and_version_change_miss(tmp_path, monkeypatch):
+    base = key(Config(**SMALL))
+    assert key(Config(parameters=dict(LPt=1.0E-6), **SMALL)) != base
+    assert key(Config(rtol=1E-6, **SMALL)) != base
+    assert key(Config(output='elsewhere', **SMALL)) == base
+    monkeypatch.setattr(cache, '_version', 'other code')
+    assert key(Config(**SMALL)) != base
+
+
+def test_other_code_version_empties_the_cache(tmp_path, monkeypatch):
+    path = str(tmp_path/'cache')
+    c = Cache(path)
+    c.put('a', dict(x=np.arange(3)))
+    assert Cache(path).get('a') is not None
+    monkeypatch.setattr(cache, '_version', 'other code')
+    c = Cache(path)
+    assert c.entries() == [] and c.get('a') is None
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    path = str(tmp_path/'cache')
+    c = Cache(path)
+    for k, name in enumerate('abc'):
+        c.put(name, dict(x=np.zeros(1000)))
+        os.utime(c._entry(name), (1000.0+k, 1000.0+k))
+    size = os.path.getsize(c._entry('a'))
+    assert c.get('a') is not None           # a hit makes a the most recent
+    c.limit = 3.5*size
+    c.put('d', dict(x=np.zeros(1000)))
+    assert sorted(os.path.basename(e)[0] for e in c.entries()) == ['a', 'c', 'd']
+    assert c.get('b') is None and c.hits == 1
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from catconv.checkpoint import Checkpoint
+from catconv.model import Model
+from catconv.parameters import Parameters
+from catconv.store import Store
+
+TOUT = np.arange(0.0, 601.0, 10.0)
+
+
+class Killed(Exception):
+    pass
+
+
+def _killed(at):
+    # A model whose run dies on the way to output time at
+    m = Model()
+    to = m._to
+
+    def _to(f, t, breaks, trace=None):
+        if t >= at:
+            raise Killed()
+        return to(f, t, breaks, trace)
+    m._to = _to
+    return m
+
+
+def _states(path):
+    return Store(path).t, np.concatenate([np.array(y) for t, y in Store(path).chunks()])
+
+
+def test_resumed_run_is_bit_identical(tmp_path):
+    whole = str(tmp_path/'whole')
+    Model().run(TOUT, whole)
+
+    path = str(tmp_path/'resumed')
+    ck = Checkpoint(str(tmp_path/'run.ckpt'), interval=0.0)
+    with pytest.raises(Killed):
+        _killed(350.0).run(TOUT, path, checkpoint=ck)
+    assert ck.saves > 0
+    y = Model().run(TOUT, path, checkpoint=Checkpoint(str(tmp_path/'run.ckpt'), interval=0.0))
+
+    t0, Y0 = _states(whole)
+    t1, Y1 = _states(path)
+    np.testing.assert_array_equal(t1, t0)
+    np.testing.assert_array_equal(Y1, Y0)
+    np.testing.assert_array_equal(y, Y0[-1])
+
+
+def test_resume_refuses_another_model(tmp_path):
+    ck = str(tmp_path/'run.ckpt')
+    with pytest.raises(Killed):
+        _killed(350.0).run(TOUT, str(tmp_path/'a'), checkpoint=Checkpoint(ck, interval=0.0))
+    other = Model(Parameters(LPt=1.0E-6))
+    with pytest.raises(ValueError, match='model differs'):
+        other.run(TOUT, str(tmp_path/'b'), checkpoint=Checkpoint(ck, interval=0.0))
+    m = Model()
+    m.pr.mech.set_constants(2*np.asarray(m.pr.mech.pre), m.pr.mech.act)
+    with pytest.raises(ValueError, match='model differs'):
+        m.run(TOUT, str(tmp_path/'c'), checkpoint=Checkpoint(ck, interval=0.0))
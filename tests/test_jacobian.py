@@ -0,0 +1,54 @@
+import numpy as np
+
+from catconv.model import Model
+from catconv.schedule import Schedule
+
+
+def _lit(lead=()):
+    # Model and a lit-off state of it, where every term of the Jacobian
+    # is alive
+    m = Model(nz=4, ns=3, nu=2, lead=lead, schedule=Schedule([0.0], Tke=[520.0]))
+    return m, m.solve([0.0, 200.0])[-1]
+
+
+def _differences(m, y):
+    # Central finite-difference Jacobian of pde at y (flat)
+    n = y.size
+    J = np.zeros((n, n))
+    for j in range(n):
+        h = 1E-7*max(abs(y[j]), 1E-6 if abs(y[j]) < 1 else 1.0)
+        yp, ym = y.copy(), y.copy()
+        yp[j] += h
+        ym[j] -= h
+        J[:,j] = (m.pde(0.0, yp)-m.pde(0.0, ym))/(2*h)
+    return J
+
+
+def test_sparse_is_the_finite_difference_jacobian():
+    # Everything but the temperature dependence of the gas transport
+    # coefficients in the gas energy balance, which jac_values() freezes
+    m, y = _lit()
+    J = m.jac(0.0, y).toarray()
+    Jfd = _differences(m, y)
+    Tk = m.lay.slices['Tk']
+    frozen = np.zeros(J.shape, dtype=bool)
+    frozen[Tk,Tk] = True
+    scale = np.abs(Jfd).max(axis=1, keepdims=True)
+    err = np.where(frozen, 0.0, np.abs(J-Jfd))/scale
+    assert err.max() < 1E-6
+    # and the frozen block is close, not unrelated
+    assert (np.abs(J-Jfd)/scale)[frozen].max() < 1E-2
+
+
+def test_banded_is_the_sparse_jacobian():
+    m, Y = _lit(lead=(2,))
+    y = Y.ravel()
+    J = m.jac(0.0, y).toarray()
+    Jb = m.J.banded(*m.jac_values(y, 0.0))
+    lb, ub, n = m.J.lband, m.J.uband, m.J.n
+    Jn = np.zeros((n, n))
+    for j in range(n):
+        for i in range(max(0, j-ub), min(n, j+lb+1)):
+            Jn[i,j] = Jb[i-j+ub,j]
+    perm = m.J.perm
+    np.testing.assert_allclose(Jn, J[np.ix_(perm, perm)], rtol=1E-13, atol=1E-13*np.abs(J).max())
@@ -0,0 +1,31 @@
+import numpy as np
+
+from catconv.model import Model
+from catconv.schedule import Schedule
+
+YO2 = (0.02, 0.12)
+
+
+def _lit():
+    # A lit-off state, where the rates depend strongly on the oxygen
+    return Model(schedule=Schedule([0.0], Tke=[520.0])).solve([0.0, 300.0])[-1]
+
+
+def test_per_member_oxygen_rates():
+    # Every member of a batch reacts with its own fixed mole fractions
+    y = _lit()
+    pair = Model(lead=(2,), schedule=Schedule([0.0], Tke=[520.0], YO2=[YO2]))
+    F = pair.pde(0.0, np.array([y, y]))
+    for b, YO2b in enumerate(YO2):
+        single = Model(schedule=Schedule([0.0], Tke=[520.0], YO2=[YO2b]))
+        np.testing.assert_allclose(F[b], single.pde(0.0, y), rtol=1E-12, atol=0)
+
+
+def test_per_member_oxygen_solve():
+    tout = [0.0, 100.0, 300.0]
+    pair = Model(lead=(2,), schedule=Schedule([0.0], Tke=[520.0], YO2=[YO2]))
+    Y = pair.solve(tout, rtol=1E-9, atol=1E-12)
+    for b, YO2b in enumerate(YO2):
+        single = Model(schedule=Schedule([0.0], Tke=[520.0], YO2=[YO2b]))
+        Yb = single.solve(tout, rtol=1E-9, atol=1E-12)
+        np.testing.assert_allclose(Y[:,b], Yb, rtol=1E-5, atol=1E-9)
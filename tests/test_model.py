@@ -0,0 +1,33 @@
+import numpy as np
+
+from catconv.model import Model
+from catconv.schedule import Schedule
+
+
+def test_pde_depends_on_t_and_y_only():
+    # The entering flow and oxygen of the schedule must be those of t, not
+    # of the time of the call before
+    schedule = Schedule([0.0, 100.0, 200.0], Tke=[420.0, 520.0, 470.0], vmean=[1.0, 4.0, 2.0],
+                        YO2=[0.05, 0.12, 0.08])
+    m = Model(schedule=schedule)
+    y = m.initial()
+    m.pde(10.0, y)
+    a = m.pde(90.0, y)
+    m.pde(190.0, y)
+    b = m.pde(90.0, y)
+    np.testing.assert_array_equal(a, b)
+
+
+def test_per_member_schedule_channels():
+    # Every schedule channel can give the members of a batch values of
+    # their own; each member then matches a model run on its values alone
+    values = dict(Tke=(450.0, 560.0), Yae=(1E-3, 4E-3), Ybe=(0.0, 0.05), Yce=(2E-4, 8E-4),
+                  YO2=(0.02, 0.12), vmean=(1.0, 4.0), Mflow=(0.3, 1.2))
+    y = Model().initial()
+    y = np.array([y, 1.1*y])
+    for name, v in values.items():
+        pair = Model(lead=(2,), schedule=Schedule([0.0, 100.0], **{name: [v, v]}))
+        F = pair.pde(50.0, y)
+        for b in range(2):
+            single = Model(schedule=Schedule([0.0, 100.0], **{name: [v[b], v[b]]}))
+            np.testing.assert_allclose(F[b], single.pde(50.0, y[b]), rtol=1E-12, atol=0, err_msg=name)
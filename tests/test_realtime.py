@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from catconv.model import Model
+from catconv.realtime import Realtime
+from catconv.schedule import Schedule
+
+TOUT = [0.0, 100.0, 200.0]
+
+
+def test_model_keeps_its_schedule():
+    schedule = Schedule([0.0, 200.0], Tke=[420.0, 560.0])
+    m = Model(schedule=schedule)
+    rt = Realtime(m, h=0.1)
+    for k in range(20):
+        rt.step(0.1, dict(Tke=650.0, Mflow=1.2))
+    assert m.schedule is schedule
+    np.testing.assert_array_equal(m.solve(TOUT), Model(schedule=schedule).solve(TOUT))
+    # and stepping again afterwards is still under the stepper's inlet
+    Tk = rt.step(0.1)[3]
+    assert Tk > 420.0
+
+
+def test_singular_factorisation_raises():
+    rt = Realtime(Model(), h=0.1)
+    rt._dgbtrf = lambda ab, kl, ku, overwrite_ab=0: (ab, np.zeros(ab.shape[1], dtype=np.int32), 3)
+    with pytest.raises(RuntimeError, match='singular'):
+        rt.step()
+    assert rt.piv is None
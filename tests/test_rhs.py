@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+
+from catconv.model import Model
+from catconv.parameters import Parameters
+from catconv.schedule import lightoff_programme
+
+# The loop right-hand side of the original script, transcribed with every
+# property in an array of its own and evaluated at the state asked about.
+
+
+def loop_pde(p, nz, ns, t, y):
+    Mco, Mco2, Mc3h8, Mair = 28.01, 44.01, 44.1, 28.96
+    Vco, Vco2, Vc3h8, Vair = 18.9, 22.262, 65.34, 20.1
+    P, R, DH, r0, por = p.P, p.R, p.DH, p.r0, p.por
+    dz = p.zl/nz
+    dzs = dz**2
+    ds = p.s0/(ns-1)
+    dss = ds**2
+    s = np.linspace(0, p.s0, ns)
+    H, Av, r_gtc = p.H, p.Av, p.r_gtc
+
+    Ya, Yb, Yc, Tk = [y[k*nz:(k+1)*nz] for k in range(4)]
+    Yas, Ybs, Ycs, Tks = [y[4*nz+k*nz*ns:4*nz+(k+1)*nz*ns].reshape(nz, ns) for k in range(4)]
+    Tkee = lightoff_programme(p.Tke)(t)['Tke']
+
+    v, Dca, Dcb, Dcc, Dia, Dib, Dic = [np.zeros(nz) for k in range(7)]
+    k_a, rho_a, Cp_a, Dt, Dit, kma, kmb, kmc, hm = [np.zeros(nz) for k in range(9)]
+    for i in range(nz):
+        v[i] = p.vmean*Tk[i]/298
+        Dca[i] = (1.013E-2*Tk[i]**1.75*(1/Mco+1/Mair)**0.5)/(P*(Vco**0.3333+Vair**0.3333)**2)
+        Dcb[i] = (1.013E-2*Tk[i]**1.75*(1/Mco2+1/Mair)**0.5)/(P*(Vco2**0.3333+Vair**0.3333)**2)
+        Dcc[i] = (1.013E-2*Tk[i]**1.75*(1/Mc3h8+1/Mair)**0.5)/(P*(Vc3h8**0.3333+Vair**0.3333)**2)
+        Dia[i] = Dca[i]+(v[i]*r0)**2.0/(48.0*Dca[i])
+        Dib[i] = Dcb[i]+(v[i]*r0)**2/(48*Dcb[i])
+        Dic[i] = Dcc[i]+(v[i]*r0)**2/(48*Dcc[i])
+        k_a[i] = 1.679E-2+5.073E-5*Tk[i]
+        rho_a[i] = P*Mair/(1000*R*Tk[i])
+        Cp_a[i] = (28.09+1.965E-3*Tk[i]+4.799E-6*Tk[i]**2-1.965E-9*Tk[i]**3)/(Mair/1000)
+        Dt[i] = k_a[i]/(rho_a[i]*Cp_a[i])
+        Dit[i] = Dt[i]+(v[i]*r0)**2/(48*Dt[i])
+        miu = 7.701E-6+4.166E-8*Tk[i]-7.531E-12*Tk[i]**2
+        Rey = rho_a[i]*p.vmean*DH/miu
+        Gz = Rey*0.7*DH/((i+1)*dz)
+        NuT = 3.657+8.827*(1000/Gz)**-0.545*math.exp(-48.2/Gz)
+        NuH = 4.367+13.18*(1000/Gz)**-0.524*math.exp(-60.2/Gz)
+        Nu = (NuT+NuH)/2+2
+        kma[i] = Nu*Dca[i]/DH
+        kmb[i] = Nu*Dcb[i]/DH
+        kmc[i] = Nu*Dcc[i]/DH
+        hm[i] = Nu*k_a[i]/DH
+
+    De = np.zeros((3, nz, ns))
+    Ds, rho_s, Cp_s, RCO, RHC, dHRP = [np.zeros((nz, ns)) for k in range(6)]
+    for jj in range(ns):
+        for i in range(nz):
+            T = Tks[i,jj]
+            for k, (M, V) in enumerate(((Mco, Vco), (Mco2, Vco2), (Mc3h8, Vc3h8))):
+                Dc = (1.013E-2*T**1.75*(1/M+1/Mair)**0.5)/(P*(V**0.3333+Vair**0.3333)**2)
+                Dk = 97.0*p.re*(T/M)**0.5
+                De[k,i,jj] = p.ff*por/(1/Dc+1/Dk)/p.tau
+            rho_s[i,jj] = p.rho_wc/1000
+            Cp_s[i,jj] = 948+0.2268*T
+            Ds[i,jj] = (0.9558-2.09E-4*T)/(rho_s[i,jj]*Cp_s[i,jj])
+            k1, k2, k3, k4, k5 = [pre*math.exp(act/T) for pre, act in zip(p.pre, p.act)]
+            YCO, YHC = Yas[i,jj], Ycs[i,jj]
+            Inh = T*(1+k2*YCO+k4*YHC)**2*(1+k5*YCO**2*YHC**2)
+            RCO[i,jj] = k1*YCO*p.YO2/Inh*R*T/P
+            RHC[i,jj] = k3*YHC*p.YO2/Inh*R*T/P
+            dHRP[i,jj] = -2.059E6+72.3*T-9.69E-2*T**2+4.34E-5*T**3+7.56e-9*T**4
+    Deas, Debs, Decs = De
+    dHR = -282.55E3
+
+    gas = (Ya, Yb, Yc, Tk)
+    entering = (p.Yae, p.Ybe, p.Yce, Tkee)
+    Di = (Dia, Dib, Dic, Dit)
+    Yt = np.zeros((4, nz))
+    for k in range(4):
+        X = gas[k]
+        for i in range(nz):
+            left = entering[k] if i == 0 else X[i-1]
+            if i < nz-1:
+                Xzz = (X[i+1]-2.0*X[i]+left)/dzs
+            else:
+                Xzz = 2*(X[i-1]-X[i])/dzs
+            Xz = (X[i]-left)/dz
+            if k < 3:
+                km = (kma, kmb, kmc)[k][i]
+                Yt[k,i] = Di[k][i]*Xzz-v[i]*Xz-4.0*km*(X[i]-(Yas, Ybs, Ycs)[k][i,0])/DH
+            else:
+                Yt[k,i] = Di[k][i]*Xzz-v[i]*Xz+(4.0*hm[i]*(Tks[i,0]-Tk[i]))/(DH*Cp_a[i]*rho_a[i])
+
+    wash = (Yas, Ybs, Ycs, Tks)
+    Dw = (Deas, Debs, Decs, Ds)
+    src = (-RCO, RCO+RHC, -RHC)
+    Wt = np.zeros((4, nz, ns))
+    for k in range(4):
+        X, D = wash[k], Dw[k]
+        for jj in range(ns):
+            for i in range(nz):
+                if jj == 0:
+                    if k < 3:
+                        km = (kma, kmb, kmc)[k][i]
+                        Xss = 1/por*(4.0*D[i,jj]*(X[i,jj+1]-X[i,jj])/dss+km*(gas[k][i]-X[i,jj])/ds)
+                    else:
+                        Xss = 4.0*D[i,jj]*(X[i,jj+1]-X[i,jj])/dss-hm[i]*(X[i,jj]-Tk[i])/(ds*rho_s[i,jj]*Cp_s[i,jj])
+                    Xsss = 0.0
+                elif jj < ns-1:
+                    Xss = (1.0/s[jj])*(X[i,jj+1]-X[i,jj-1])/(2.0*ds)
+                    Xsss = (X[i,jj+1]-2*X[i,jj]+X[i,jj-1])/dss
+                else:
+                    Xss = 0.0
+                    Xsss = 2*(X[i,jj-1]-X[i,jj])/dss
+                if i == 0:
+                    Xzz = 2*(X[i+1,jj]-X[i,jj])/dzs
+                elif i < nz-1:
+                    Xzz = (X[i+1,jj]-2.0*X[i,jj]+X[i-1,jj])/dzs
+                else:
+                    Xzz = 2*(X[i-1,jj]-X[i,jj])/dzs
+                T = Tks[i,jj]
+                if k < 3:
+                    r = src[k][i,jj]*H*Av/r_gtc*R*T/P
+                    if jj == 0:
+                        Wt[k,i,jj] = Xss+(1/por)*(D[i,jj]*Xzz+r)
+                    else:
+                        Wt[k,i,jj] = (1/por)*(D[i,jj]*(Xss+Xsss+Xzz)+r)
+                else:
+                    q = (-RCO[i,jj]*dHR-RHC[i,jj]*dHRP[i,jj])*H*Av/(rho_s[i,jj]*Cp_s[i,jj])
+                    if jj == 0:
+                        Wt[k,i,jj] = Xss+D[i,jj]*Xzz+q
+                    else:
+                        Wt[k,i,jj] = D[i,jj]*(Xss+Xsss+Xzz)+q
+    return np.concatenate((Yt.ravel(), Wt.ravel()))
+
+
+def test_vectorised_rhs_is_the_loop_rhs():
+    p = Parameters()
+    m = Model(p, nz=4, ns=3, nu=0)
+    rng = np.random.RandomState(1)
+    y = m.initial()
+    for name in m.lay.species_fields:
+        y[m.lay.slices[name]] *= 1+0.3*rng.uniform(-1, 1, y[m.lay.slices[name]].shape)
+    for name in m.lay.temperature_fields:
+        y[m.lay.slices[name]] = 480+40*rng.uniform(-1, 1, y[m.lay.slices[name]].shape)
+    for t in (0.0, 350.0, 1000.0):
+        np.testing.assert_allclose(m.pde(t, y), loop_pde(p, 4, 3, t, y), rtol=1E-10, atol=1E-14)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from catconv.model import Model
+from catconv.schedule import Schedule
+from catconv.steady import SteadyState
+
+
+def test_newton_is_the_long_time_transient():
+    s = SteadyState()
+    y = s.steady(500.0)
+    Y = Model(schedule=Schedule([0.0], Tke=[500.0])).solve([0.0, 2E4], rtol=1E-9)[-1]
+    assert np.max(np.abs(y-Y)/s.scale) < 1E-8
+
+
+def test_turning_points():
+    # The default slice has a narrow ignition S about 531.1 .. 531.2 K:
+    # traced either way, the points turn back at the same two folds, and
+    # between them the curve holds three distinct steady states
+    up = SteadyState().lightoff([525.0, 540.0])
+    down = SteadyState().lightoff([540.0, 525.0])
+    assert len(up['folds']) == 2 and len(down['folds']) == 2
+    np.testing.assert_allclose(sorted(up['folds']), sorted(down['folds']), atol=5E-3)
+    assert 531.0 < min(up['folds']) < max(up['folds']) < 531.3
+
+    mid = np.mean(up['folds'])
+    T, Y = up['Tke'], up['y']
+    cross = np.flatnonzero((T[:-1]-mid)*(T[1:]-mid) < 0)
+    assert len(cross) == 3
+    s = SteadyState()
+    conv = []
+    for k in cross:
+        a = (mid-T[k])/(T[k+1]-T[k])
+        y = s.newton(Y[k]+a*(Y[k+1]-Y[k]), mid, method='krylov')[0]
+        conv.append(s.outlet(y)['COconv'])
+    assert np.min(np.diff(sorted(conv))) > 0.01
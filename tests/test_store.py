@@ -0,0 +1,47 @@
+import numpy as np
+
+from catconv.layout import Layout
+from catconv.store import Store, Writer
+
+
+def _steps(lay, count):
+    rng = np.random.RandomState(0)
+    return np.arange(count)*0.5, rng.uniform(size=(count, 2, lay.n))
+
+
+def test_round_trip_with_a_partial_chunk(tmp_path):
+    lay = Layout(4, 3, 2)
+    t, Y = _steps(lay, 7)
+    path = str(tmp_path/'store')
+    with Writer(path, lay, (2, lay.n), chunk=3, meta=dict(run='test')) as w:
+        for k in range(7):
+            w.append(t[k], Y[k])
+
+    s = Store(path)
+    assert s.n_chunks == 3 and len(s) == 7
+    assert [len(c[0]) for c in s.chunks()] == [3, 3, 1]
+    assert s.meta == dict(run='test')
+    np.testing.assert_array_equal(s.t, t)
+    np.testing.assert_array_equal(s.field('Tks'), lay.view(Y, 'Tks'))
+    np.testing.assert_array_equal(s.field('Ya', -1), lay.view(Y, 'Ya')[...,-1])
+    np.testing.assert_array_equal(s[4], Y[4])
+    np.testing.assert_array_equal(s[-1], Y[-1])
+
+
+def test_resume_from_the_middle_of_a_chunk(tmp_path):
+    lay = Layout(4, 3, 2)
+    t, Y = _steps(lay, 8)
+    path = str(tmp_path/'store')
+    with Writer(path, lay, (2, lay.n), chunk=3) as w:
+        for k in range(5):
+            w.append(t[k], Y[k])
+        state = w.state()                   # one chunk and two steps
+        w.append(t[5], Y[5])                # lost with the run
+    with Writer(path, lay, (2, lay.n), resume=state) as w:
+        for k in range(5, 8):
+            w.append(t[k], Y[k])
+
+    s = Store(path)
+    assert len(s) == 8
+    np.testing.assert_array_equal(s.t, t)
+    np.testing.assert_array_equal(np.concatenate([np.array(y) for _, y in s.chunks()]), Y)
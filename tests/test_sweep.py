@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from catconv.sweep import run, scenarios, sweep
+
+TOUT = np.arange(0.0, 301.0, 50.0)
+
+
+def test_scenario_tables():
+    assert scenarios(dict(Tke=[420, 450], vmean=[2.0, 3.0])) == [dict(Tke=420, vmean=2.0), dict(Tke=450, vmean=3.0)]
+    with pytest.raises(ValueError):
+        scenarios(dict(Tke=[420, 450], vmean=[2.0]))
+
+
+def test_pool_runs_are_the_single_runs():
+    table = dict(Tke=[430.0, 520.0], YO2=[0.05, 0.1])
+    results = sweep(table, TOUT, nz=4, ns=3, nu=2, processes=2)
+    assert [r['scenario'] for r in results] == scenarios(table)
+    for r, s in zip(results, scenarios(table)):
+        assert r['error'] is None
+        np.testing.assert_array_equal(r['COconv'], run(s, TOUT, nz=4, ns=3, nu=2)['COconv'])
+    assert results[1]['COconv'][-1] > results[0]['COconv'][-1]